@@ -0,0 +1,6 @@
+"""
+Benchmarks for the pl_market pipeline against a local stand-in for the
+Polymarket data API and CLOB, fed with synthetic holdings and order books.
+
+    python -m benchmarks.run --wallets 4 --positions 500 -o results.json
+"""
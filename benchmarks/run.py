@@ -0,0 +1,180 @@
+"""
+Times every stage of the pipeline against the local stand-in and writes the
+results to JSON; with --baseline, compares against an earlier run.
+
+    python -m benchmarks.run --wallets 4 --positions 500 --latency 0.02 -o results.json
+    python -m benchmarks.run --wallets 4 --positions 500 --baseline results.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from py_clob_client.client import ClobClient
+
+from pl_market import books, holdings, liquidation
+from pl_market.dates import extract_end_dates
+from pl_market.portfolio import build_view_model, open_positions
+from pl_market.refresh import Refresher
+from pl_market.risk import classify_risk_from_prices
+
+from .server import StandInServer
+from .synthetic import make_positions
+
+STAGES = ["fetch_holdings", "fetch_order_books", "fetch_order_books_direct", "add_partial_sell_prices", "enrichment",
+    "build_view_model", "refresher_cold", "refresher_warm"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--wallets", type=int, default=4)
+    parser.add_argument("--positions", type=int, default=250, help="positions per wallet")
+    parser.add_argument("--overlap", type=float, default=0.2, help="fraction of positions in assets shared by all wallets")
+    parser.add_argument("--depth", type=int, default=50, help="levels per side of every book")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stand-in adds to every request")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per stage, after one warm-up")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write results to this JSON file instead of stdout")
+    parser.add_argument("--baseline", help="earlier results JSON to compare medians against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+        help="with --baseline, exit 1 if a stage's median is slower by more than this fraction")
+    return parser.parse_args(argv)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def enrich(positions):
+    """The risk and date enrichment build_view_model does, timed on its own."""
+    risk = classify_risk_from_prices(positions['curPrice'])
+    end_dates = extract_end_dates(positions['title'])
+    return risk, end_dates
+
+def load_page(refresher, wallets):
+    """What a dashboard page load fetches: holdings, then the books of their open positions."""
+    positions, _ = refresher.get_many("holdings", wallets)
+    holdings_df = holdings.holdings_frame(positions, wallets)
+    asset_ids = open_positions(holdings_df)['asset'].astype(str).tolist() if not holdings_df.empty else []
+    return refresher.get_many("books", list(dict.fromkeys(asset_ids)))
+
+def run_refresher(wallets, session, client):
+    """
+    A page load through a new Refresher set up like the dashboard's (all
+    misses, loaded now), then again once it holds everything (served from memory).
+    """
+    refresher = Refresher()
+    refresher.register("holdings", partial(holdings.load_positions, session=session), ttl=holdings.HOLDINGS_TTL)
+    refresher.register("books", partial(books.load_order_books, client), ttl=books.ORDER_BOOK_TTL)
+    timings = {}
+    _, timings["refresher_cold"] = timed(load_page, refresher, wallets)
+    _, timings["refresher_warm"] = timed(load_page, refresher, wallets)
+    refresher.stop()
+    return timings
+
+def run_pipeline(wallets, session, client, direct_client):
+    """
+    One pass through every stage; returns ({stage: seconds}, counts). Books
+    are fetched with the py_clob_client ClobClient the dashboard uses, and
+    again with ClobBooksClient for comparison.
+    """
+    timings, counts = {}, {}
+    (holdings_df, errors), timings["fetch_holdings"] = timed(holdings.fetch_holdings, wallets, session)
+    positions = open_positions(holdings_df)
+    asset_ids = positions['asset'].astype(str).tolist() if not positions.empty else []
+    counts.update(wallets=len(wallets), wallet_errors=len(errors), positions=len(positions), assets=len(set(asset_ids)))
+
+    order_books, timings["fetch_order_books"] = timed(books.fetch_order_books, asset_ids, client)
+    counts["books"] = len(order_books)
+    counts["book_errors"] = counts["assets"] - len(order_books)
+    _, timings["fetch_order_books_direct"] = timed(books.fetch_order_books, asset_ids, direct_client)
+    timings.update(run_refresher(wallets, session, client))
+
+    if positions.empty:
+        return timings, counts
+    stock_info_df, timings["add_partial_sell_prices"] = timed(liquidation.add_partial_sell_prices,
+        positions.copy(), order_books, liquidation.PERCENT_LIST)
+    _, timings["enrichment"] = timed(enrich, stock_info_df)
+    _, timings["build_view_model"] = timed(build_view_model, stock_info_df.copy())
+    return timings, counts
+
+def summarize(samples):
+    return {"runs": len(samples), "min": min(samples), "median": statistics.median(samples),
+        "mean": statistics.fmean(samples), "max": max(samples)}
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": platform.python_version(), "platform": platform.platform(), "numpy": np.__version__,
+        "pandas": pd.__version__, "commit": commit}
+
+def compare(results, baseline, tolerance):
+    """Prints median ratios per stage; returns the stages slower than the tolerance allows."""
+    regressions = []
+    for stage in STAGES:
+        new, old = results["stages"].get(stage), baseline.get("stages", {}).get(stage)
+        if not new or not old or not old["median"]:
+            continue
+        ratio = new["median"] / old["median"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{stage:<24} {old['median'] * 1000:9.1f} ms -> {new['median'] * 1000:9.1f} ms  x{ratio:.2f} {flag}", file=sys.stderr)
+        if flag:
+            regressions.append(stage)
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    positions = make_positions(args.wallets, args.positions, args.overlap, seed=args.seed)
+    wallets = list(positions)
+
+    with StandInServer(positions, args.depth, args.latency, args.jitter, args.error_rate, args.seed) as server:
+        # Point the data API at the stand-in; the CLOB clients take their host directly
+        holdings.DATA_API_URL = server.url
+        session = holdings.make_http_session()
+        client = ClobClient(server.url, chain_id=books.CHAIN_ID)
+        direct_client = books.ClobBooksClient(session, host=server.url)
+
+        run_pipeline(wallets, session, client, direct_client)  # warm-up: imports, connection pools, stand-in book cache
+        samples, counts, failures = {stage: [] for stage in STAGES}, {}, {"wallet_errors": 0, "book_errors": 0}
+        for _ in range(args.repeat):
+            timings, counts = run_pipeline(wallets, session, client, direct_client)
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+            for key in failures:
+                failures[key] += counts.pop(key, 0)
+        requests_served = dict(server.requests)
+
+    results = {"config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance")},
+        "environment": environment(),
+        "counts": counts,
+        "failures": failures,
+        "requests": requests_served,
+        "stages": {stage: summarize(seconds) for stage, seconds in samples.items() if seconds}}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Local stand-in for the data API's /positions and the CLOB's /book and /books,
+with configurable latency and error rate.
+
+    python -m benchmarks.server --wallets 4 --positions 500 --latency 0.05 --port 8765
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .synthetic import make_book, make_positions
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real services
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay_or_fail(self):
+        """Sleeps for the configured latency; returns True if this request should fail."""
+        stand_in = self.server.stand_in
+        stand_in.count(self.command, urlparse(self.path).path)
+        time.sleep(max(0.0, stand_in.latency + stand_in.rng.uniform(-stand_in.jitter, stand_in.jitter)))
+        if stand_in.rng.random() < stand_in.error_rate:
+            self._send(503, {"error": "injected failure"})
+            return True
+        return False
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if self._delay_or_fail():
+            return
+        if url.path == "/positions":
+            rows = stand_in.positions.get(query.get("user", [""])[0], [])
+            offset, limit = int(query.get("offset", ["0"])[0]), int(query.get("limit", ["100"])[0])
+            self._send(200, rows[offset:offset + limit])
+        elif url.path == "/book":
+            self._send(200, stand_in.book(query["token_id"][0]))
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        stand_in = self.server.stand_in
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+        if self._delay_or_fail():
+            return
+        if urlparse(self.path).path == "/books":
+            self._send(200, [stand_in.book(params["token_id"]) for params in json.loads(body or b"[]")])
+        else:
+            self._send(404, {"error": "not found"})
+
+
+class StandInServer:
+    """
+    Serves synthetic positions and books on 127.0.0.1. Every request waits
+    `latency` ± `jitter` seconds and fails with a 503 at `error_rate`.
+    """
+    def __init__(self, positions, depth=50, latency=0.0, jitter=0.0, error_rate=0.0, seed=0, port=0):
+        self.positions = positions
+        self.depth = depth
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.requests = {}
+        self._books = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stand_in = self
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, method, path):
+        with self._lock:
+            key = f"{method} {path}"
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def book(self, asset_id):
+        if asset_id not in self._books:
+            self._books[asset_id] = make_book(asset_id, self.depth, self.seed)
+        return self._books[asset_id]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="stand-in").start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.server", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--wallets", type=int, default=1)
+    parser.add_argument("--positions", type=int, default=100, help="positions per wallet")
+    parser.add_argument("--depth", type=int, default=50, help="levels per side of every book")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    positions = make_positions(args.wallets, args.positions, seed=args.seed)
+    server = StandInServer(positions, args.depth, args.latency, args.jitter, args.error_rate, args.seed, args.port)
+    print(f"serving {sum(map(len, positions.values()))} positions on {server.url} for wallets:")
+    print("\n".join(positions))
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
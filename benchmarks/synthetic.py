@@ -0,0 +1,74 @@
+"""
+Synthetic holdings and order books shaped like the data API's /positions and
+the CLOB's /book responses. Everything is derived from a seed, so the same
+arguments always produce the same portfolio and the same books.
+"""
+import random
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+    "August", "September", "October", "November", "December"]
+TITLE_TEMPLATES = [
+    "Will {subject} happen by {month} {day}?",
+    "Will {subject} happen by {day} {month} {year}?",
+    "{subject} before {year}?",
+    "Will {subject} happen in {month}?",
+    "{subject}: who wins?",
+]
+
+
+def asset_id_for(index):
+    """Token ids are 77-digit decimal strings upstream; keep the shape."""
+    return str(10 ** 76 + index)
+
+def make_positions(n_wallets=1, positions_per_wallet=100, overlap=0.2, seed=0):
+    """
+    Raw positions per wallet. A fraction `overlap` of each wallet's positions
+    are in assets other wallets hold too, like copy-traded portfolios.
+    Returns:
+        dict: wallet address -> list of position dicts.
+    """
+    rng = random.Random(seed)
+    shared_pool = max(1, int(positions_per_wallet * overlap))
+    positions = {}
+    for w in range(n_wallets):
+        wallet = f"0x{w:040x}"
+        rows = []
+        for i in range(positions_per_wallet):
+            if i < shared_pool:
+                index = i  # the same assets across wallets
+            else:
+                index = shared_pool + w * positions_per_wallet + i
+            market = index // 2
+            cur_price = round(rng.uniform(0.01, 0.99), 3)
+            avg_price = round(rng.uniform(0.01, 0.99), 3)
+            size = round(rng.uniform(1, 5000), 2)
+            title = rng.choice(TITLE_TEMPLATES).format(subject=f"Event {market // 4} outcome {market}",
+                month=rng.choice(MONTHS), day=rng.randint(1, 28), year=rng.choice([2025, 2026, 2027]))
+            rows.append({"proxyWallet": wallet, "asset": asset_id_for(index), "conditionId": f"0x{market:064x}",
+                "size": size, "avgPrice": avg_price, "initialValue": round(size * avg_price, 2),
+                "currentValue": round(size * cur_price, 2), "cashPnl": round(size * (cur_price - avg_price), 2),
+                "percentPnl": round((cur_price - avg_price) / avg_price * 100, 2), "totalBought": size,
+                "realizedPnl": 0.0, "percentRealizedPnl": 0.0, "curPrice": cur_price,
+                "redeemable": rng.random() < 0.05, "mergeable": False, "title": title,
+                "slug": f"market-{market}", "icon": "https://example.com/icon.png", "eventSlug": f"event-{market // 4}",
+                "outcome": "Yes" if index % 2 == 0 else "No", "outcomeIndex": index % 2,
+                "oppositeOutcome": "No" if index % 2 == 0 else "Yes", "oppositeAsset": asset_id_for(index ^ 1),
+                "endDate": rng.choice(["", f"{rng.choice([2025, 2026])}-12-31"]), "negativeRisk": False})
+        positions[wallet] = rows
+    return positions
+
+def make_book(asset_id, depth=50, seed=0):
+    """
+    A /book response for the asset with `depth` levels per side around a
+    mid price, bids below and asks above.
+    """
+    rng = random.Random(f"{seed}:{asset_id}")
+    mid = rng.uniform(0.05, 0.95)
+    bids = [{"price": f"{max(0.001, mid - 0.001 * (level + 1)):.3f}", "size": f"{rng.uniform(1, 2000):.2f}"}
+        for level in range(depth)]
+    asks = [{"price": f"{min(0.999, mid + 0.001 * (level + 1)):.3f}", "size": f"{rng.uniform(1, 2000):.2f}"}
+        for level in range(depth)]
+    # Upstream lists levels worst price first
+    return {"market": f"market-{asset_id[-6:]}", "asset_id": asset_id, "timestamp": "0", "hash": f"h{asset_id[-6:]}",
+        "bids": bids[::-1], "asks": asks[::-1], "min_order_size": "5", "neg_risk": False, "tick_size": "0.001",
+        "last_trade_price": f"{mid:.3f}"}
@@ -0,0 +1,45 @@
+"""
+Headless Polymarket portfolio engine behind the Streamlit dashboard.
+
+Submodules are imported on first use, so `import pl_market` stays cheap and
+nothing here pulls in Streamlit or Plotly.
+"""
+import importlib
+
+_EXPORTS = {
+    "fetch_holdings": "holdings",
+    "OrderBook": "books",
+    "OrderBookCache": "books",
+    "ClobBooksClient": "books",
+    "CircuitBreaker": "resilience",
+    "Deadline": "resilience",
+    "call_upstream": "resilience",
+    "fetch_order_books": "books",
+    "make_clob_client": "books",
+    "add_partial_sell_prices": "liquidation",
+    "liquidate_positions": "liquidation",
+    "depth_curves": "liquidation",
+    "LiveOrderBooks": "live",
+    "LiveLiquidation": "live",
+    "MarketFeed": "live",
+    "ReplayFeed": "live",
+    "HistoryStore": "history",
+    "simulate_resolutions": "simulate",
+    "Tracer": "tracing",
+    "Refresher": "refresh",
+    "classify_risk": "risk",
+    "get_risk_info_from_price": "risk",
+    "extract_date_from_title": "dates",
+    "extract_end_dates": "dates",
+    "build_view_model": "portfolio",
+    "compute_portfolio": "portfolio",
+    "portfolio_totals": "portfolio",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
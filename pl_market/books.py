@@ -0,0 +1,216 @@
+"""Order books from the Polymarket CLOB, stored as compact NumPy arrays."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+
+import numpy as np
+
+from .holdings import FETCH_WORKERS, REQUEST_TIMEOUT
+from .resilience import CircuitBreaker, Deadline, call_upstream, hedge_delay
+from .tracing import span
+
+CLOB_HOST = "https://clob.polymarket.com/"
+CHAIN_ID = 137
+ORDER_BOOK_TTL = 60  # seconds a cached book stays fresh
+ORDER_BOOK_BATCH_SIZE = 50  # token ids per get_order_books call
+ORDER_BOOKS_DEADLINE = 20  # seconds for one fetch of all batches, retries included
+
+clob_breaker = CircuitBreaker("clob")
+
+def make_clob_client(api_key=""):
+    from py_clob_client.client import ClobClient  # slow import, only needed once books are fetched
+
+    return ClobClient(CLOB_HOST, key=api_key, chain_id=CHAIN_ID)
+
+class OrderBookCache:
+    """
+    Order books keyed by asset id, each with its own fetch time, so adding a
+    wallet or position only fetches the books that are missing or stale.
+    Meant to be shared, e.g. across sessions and reruns through st.cache_resource.
+    """
+    def __init__(self, ttl=ORDER_BOOK_TTL):
+        self.ttl = ttl
+        self._books = {}  # asset_id -> (fetched_at, book)
+        self._lock = threading.Lock()
+
+    def get_many(self, asset_ids):
+        """Returns (fresh books by asset id, list of asset ids that need fetching)."""
+        now = time.monotonic()
+        books, missing = {}, []
+        with self._lock:
+            for asset_id in asset_ids:
+                entry = self._books.get(asset_id)
+                if entry is not None and now - entry[0] < self.ttl:
+                    books[asset_id] = entry[1]
+                else:
+                    missing.append(asset_id)
+        return books, missing
+
+    def put_many(self, books):
+        now = time.monotonic()
+        with self._lock:
+            for asset_id, book in books.items():
+                self._books[asset_id] = (now, book)
+            # Drop anything long expired so the cache doesn't grow with every asset ever viewed
+            expired = [k for k, (fetched_at, _) in self._books.items() if now - fetched_at >= 2 * self.ttl]
+            for asset_id in expired:
+                del self._books[asset_id]
+
+class OrderBook:
+    """
+    One asset's book stored as sorted float64 arrays. Bids are best (highest)
+    price first, asks best (lowest) price first, and *_notional holds the
+    running price * size total down each side. Metadata is kept once per book.
+    """
+    __slots__ = ('asset_id', 'market', 'timestamp', 'hash',
+                 'bid_price', 'bid_size', 'bid_notional',
+                 'ask_price', 'ask_size', 'ask_notional')
+
+    def __init__(self, asset_id, bid_price, bid_size, ask_price, ask_size, market=None, timestamp=None, hash=None):
+        self.asset_id = asset_id
+        self.market = market
+        self.timestamp = timestamp
+        self.hash = hash
+        bid_price = np.asarray(bid_price, dtype=np.float64)
+        bid_size = np.asarray(bid_size, dtype=np.float64)
+        ask_price = np.asarray(ask_price, dtype=np.float64)
+        ask_size = np.asarray(ask_size, dtype=np.float64)
+        bid_order = np.argsort(-bid_price, kind='stable')
+        ask_order = np.argsort(ask_price, kind='stable')
+        self.bid_price, self.bid_size = bid_price[bid_order], bid_size[bid_order]
+        self.ask_price, self.ask_size = ask_price[ask_order], ask_size[ask_order]
+        self.bid_notional = np.cumsum(self.bid_price * self.bid_size)
+        self.ask_notional = np.cumsum(self.ask_price * self.ask_size)
+
+    @classmethod
+    def from_summary(cls, order_book):
+        """Builds a book from a py_clob_client OrderBookSummary (prices and sizes arrive as strings)."""
+        bids = order_book.bids or []
+        asks = order_book.asks or []
+        return cls(order_book.asset_id,
+            [level.price for level in bids], [level.size for level in bids],
+            [level.price for level in asks], [level.size for level in asks],
+            market=order_book.market, timestamp=order_book.timestamp, hash=order_book.hash)
+
+    @classmethod
+    def from_dict(cls, raw):
+        """Builds a book from the raw JSON the CLOB returns for /book and /books."""
+        bids = raw.get('bids') or []
+        asks = raw.get('asks') or []
+        return cls(raw['asset_id'],
+            [level['price'] for level in bids], [level['size'] for level in bids],
+            [level['price'] for level in asks], [level['size'] for level in asks],
+            market=raw.get('market'), timestamp=raw.get('timestamp'), hash=raw.get('hash'))
+
+    def _levels(self):
+        return np.concatenate([self.bid_price, self.bid_size, self.ask_price, self.ask_size]).tobytes()
+
+    def __reduce__(self):
+        # Pickle one flat buffer of levels; the notionals are rebuilt on load
+        return (_unpack_order_book, (self.asset_id, self.market, self.timestamp, self.hash, len(self.bid_price), self._levels()))
+
+    def cache_key(self):
+        """Bytes identifying the book's contents, used as its st.cache_data hash."""
+        # The bid count splits the flat levels back into sides, as in __reduce__
+        return f"{self.asset_id}:{len(self.bid_price)}:".encode() + self._levels()
+
+    def __repr__(self):
+        return f"OrderBook({self.asset_id!r}, bids={len(self.bid_price)}, asks={len(self.ask_price)})"
+
+def _unpack_order_book(asset_id, market, timestamp, hash, n_bids, buffer):
+    levels = np.frombuffer(buffer, dtype=np.float64)
+    n_asks = (len(levels) - 2 * n_bids) // 2
+    bid_price, bid_size = levels[:n_bids], levels[n_bids:2 * n_bids]
+    ask_price, ask_size = levels[2 * n_bids:2 * n_bids + n_asks], levels[2 * n_bids + n_asks:]
+    return OrderBook(asset_id, bid_price, bid_size, ask_price, ask_size, market=market, timestamp=timestamp, hash=hash)
+
+class ClobBooksClient:
+    """
+    Reads order books straight from the CLOB's public /books endpoint over a
+    requests session. Lets batch jobs skip importing py_clob_client, which
+    takes longer than the rest of the engine to load.
+    """
+    def __init__(self, session, host=CLOB_HOST, timeout=REQUEST_TIMEOUT):
+        self.session = session
+        self.host = host.rstrip("/")
+        self.timeout = timeout
+
+    def order_books(self, asset_ids, timeout=None):
+        with span("order_books_api", assets=len(asset_ids)) as request:
+            response = self.session.post(f"{self.host}/books", json=[{"token_id": token_id} for token_id in asset_ids],
+                timeout=timeout or self.timeout)
+            request.set(status=response.status_code)
+            response.raise_for_status()
+            return {raw['asset_id']: OrderBook.from_dict(raw) for raw in response.json()}
+
+def fetch_order_book_batch(client, asset_ids, timeout=None):
+    if isinstance(client, ClobBooksClient):
+        return client.order_books(asset_ids, timeout)
+    from py_clob_client.clob_types import BookParams
+
+    # ClobClient takes no per-call timeout; the batch deadline still bounds how long we wait
+
+    with span("order_books_api", assets=len(asset_ids)) as request:
+        order_books = client.get_order_books([BookParams(token_id=token_id) for token_id in asset_ids])
+        request.set(status=200)
+    return {order_book.asset_id: OrderBook.from_summary(order_book) for order_book in order_books}
+
+def fetch_order_book_batches(client, asset_ids, deadline=None):
+    """
+    Fetches books in batches of ORDER_BOOK_BATCH_SIZE sent in parallel, each
+    retried and hedged (see call_upstream). A failed or late batch only loses
+    its own books.
+    Returns:
+        tuple: (books, errors) where errors maps each asset id without a book
+               to the reason.
+    """
+    order_books, errors = {}, {}
+    if not asset_ids:
+        return order_books, errors
+    deadline = deadline or Deadline(ORDER_BOOKS_DEADLINE)
+    batches = [asset_ids[i:i + ORDER_BOOK_BATCH_SIZE] for i in range(0, len(asset_ids), ORDER_BOOK_BATCH_SIZE)]
+    pool = ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(batches)))
+    futures = {pool.submit(call_upstream, partial(fetch_order_book_batch, client, batch), breaker=clob_breaker,
+        deadline=deadline, timeout=REQUEST_TIMEOUT, hedge_after=hedge_delay("order_books_api")): batch for batch in batches}
+    wait(futures, timeout=deadline.remaining())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for future, batch in futures.items():
+        if not future.done():
+            reason = f"no answer within the {deadline.seconds}s deadline"
+        elif future.exception() is not None:
+            reason = str(future.exception())
+        else:
+            order_books.update(future.result())
+            reason = "no book returned"
+        errors.update((asset_id, reason) for asset_id in batch if asset_id not in order_books)
+    return order_books, errors
+
+def load_order_books(client, asset_ids, store=None):
+    """
+    fetch_order_book_batches that also saves what it got to a SnapshotStore;
+    the Refresher's loader for books. Returns (books, errors).
+    """
+    order_books, errors = fetch_order_book_batches(client, asset_ids)
+    if store is not None and order_books:
+        store.save_books(order_books)
+    return order_books, errors
+
+def fetch_order_books(asset_ids, client, cache=None):
+    """
+    Serves warm books from the per-asset cache and fetches only the missing or
+    stale ones, split into bounded batches sent in parallel.
+    Without a cache every book is fetched. Books that couldn't be fetched are
+    simply absent from the result.
+    """
+    if not asset_ids:
+        return {}
+    cache = cache or OrderBookCache()
+    with span("fetch_order_books") as stage:
+        order_book_asset, missing = cache.get_many(list(dict.fromkeys(asset_ids)))
+        stage.set(assets=len(order_book_asset) + len(missing), cache_hits=len(order_book_asset), cache_misses=len(missing))
+        fetched, errors = fetch_order_book_batches(client, missing)
+        stage.set(missing=len(errors))
+        cache.put_many(fetched)
+        order_book_asset.update(fetched)
+    return order_book_asset
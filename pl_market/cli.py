@@ -0,0 +1,72 @@
+"""
+Batch entry point: the dashboard's metrics for many wallets, written to CSV or Parquet.
+
+    python -m pl_market 0xabc... 0xdef... -o positions.parquet --totals totals.json
+"""
+import argparse
+import json
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m pl_market", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("wallets", nargs="*", help="wallet addresses")
+    parser.add_argument("--wallets-file", help="file with one wallet address per line")
+    parser.add_argument("-o", "--output", help="positions file (.csv or .parquet); CSV on stdout if omitted")
+    parser.add_argument("--totals", help="write totals (overall and per wallet) to this JSON file instead of stderr")
+    parser.add_argument("--percent", type=float, action="append",
+        help="liquidation fraction, repeatable (default 0.25 0.5 0.75 1; 1 is always included)")
+    parser.add_argument("--allocation", choices=["pro_rata", "priority"],
+        help="wallets holding the same asset share its book, split pro rata or in the order wallets are given")
+    parser.add_argument("--metrics", metavar="FILE", help="write per-stage timings to FILE in Prometheus text format")
+    parser.add_argument("--history", metavar="DIR", help="also append this snapshot to the PnL history in DIR")
+    return parser.parse_args(argv)
+
+
+def read_wallets(args):
+    wallets = list(args.wallets)
+    if args.wallets_file:
+        with open(args.wallets_file) as f:
+            wallets += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return wallets
+
+
+def write_positions(df, output):
+    if output is None:
+        df.to_csv(sys.stdout, index=False)
+    elif output.endswith(".parquet"):
+        df.to_parquet(output, index=False)
+    elif output.endswith(".csv"):
+        df.to_csv(output, index=False)
+    else:
+        raise SystemExit(f"unsupported output format: {output} (use .csv or .parquet)")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    wallets = read_wallets(args)
+    if not wallets:
+        print("no wallets given", file=sys.stderr)
+        return 2
+
+    from .portfolio import compute_portfolio, portfolio_totals
+
+    percent_list = sorted(set(args.percent or [0.25, 0.50, 0.75]) | {1})
+    df, totals, errors = compute_portfolio(wallets, percent_list=percent_list, allocation=args.allocation)
+    write_positions(df, args.output)
+    if args.history:
+        from .history import HistoryStore
+        HistoryStore(args.history).append(df)
+    if args.metrics:
+        from .tracing import tracer
+        tracer.write_prometheus(args.metrics)
+
+    summary = {"totals": totals, "errors": errors,
+        "missing_books": sorted(df.loc[~df['has_book'].astype(bool), 'asset'].astype(str).unique()) if not df.empty else [],
+        "wallets": {wallet: portfolio_totals(group) for wallet, group in df.groupby('wallet')} if not df.empty else {}}
+    if args.totals:
+        with open(args.totals, "w") as f:
+            json.dump(summary, f, indent=2)
+    else:
+        print(json.dumps(summary, indent=2), file=sys.stderr)
+    return 1 if errors and len(errors) == len(set(wallets)) else 0
@@ -0,0 +1,92 @@
+"""End dates parsed from market titles."""
+import re
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+MONTH_NUMBERS = {name.lower(): i for i, name in enumerate(MONTH_NAMES, 1)}
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_YEAR = r"(?:,?\s*(20\d{2}))?"  # only a year right after the day belongs to the date
+DATE_PATTERNS = [
+    re.compile(rf"\b(?:before|after|by)\s*{_MONTH}\s*(\d{{1,2}}){_YEAR}\b", re.IGNORECASE),  # e.g., "before May 31, 2026"
+    re.compile(rf"\b{_MONTH}\s*(\d{{1,2}}){_YEAR}\s*(?:before|after|by)\b", re.IGNORECASE),  # e.g., "May 31 before"
+]
+YEAR_PATTERN = re.compile(r"(?<![$\d.,])\b(20\d{2})\b(?![.,]?\d)")  # e.g., "2025", but not a price like "$2000"
+
+@lru_cache(maxsize=16384)
+def parse_title_date(title: str):
+    """
+    Finds the month/day and year mentioned in a market title. With a month/day,
+    only a year written right after it counts ("June 30, 2026"), so numbers like
+    "$2000" elsewhere in the title aren't taken for the year.
+    Returns a (year, month, day) tuple; parts that aren't found are None.
+    """
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(title)
+        if match:
+            year = match.group(3)
+            return (int(year) if year else None), MONTH_NUMBERS[match.group(1)[:3].lower()], int(match.group(2))
+    year = YEAR_PATTERN.search(title)
+    return (int(year.group(1)) if year else None), None, None
+
+def nearest_year(month, day, reference):
+    """The year (reference year +/- 1) that puts month/day closest to the reference date."""
+    candidates = []
+    for year in (reference.year - 1, reference.year, reference.year + 1):
+        try:
+            candidates.append(date(year, month, day))
+        except ValueError:
+            continue
+    return min(candidates, key=lambda d: abs(d - reference)).year if candidates else None
+
+def extract_date_from_title(title: str, reference=None, context_year=None) -> str:
+    """
+    Extracts a date from the title string, looking for "before", "after", or "by".
+    The year is taken from the title if it has one, then from context_year (e.g.
+    the end date of another market in the same event), and otherwise is the
+    year that puts the date nearest to reference (today by default).
+    Returns a string in YYYY-MM-DD format if found, otherwise "".
+    """
+    year, month, day = parse_title_date(title)
+    if month is None:
+        return f"{year}-12-31" if year else ""  # Default to Dec 31 if only year is found
+    year = year or context_year or nearest_year(month, day, reference or date.today())
+    try:
+        return date(year, month, day).isoformat()
+    except (TypeError, ValueError):
+        return ""  # Return empty string if the day doesn't exist in that month
+
+def extract_end_dates(titles, reference=None, context_years=None):
+    """
+    extract_date_from_title over a whole column. Titles are parsed with the
+    cached parse_title_date, so reruns over the same portfolio hit the cache.
+    Args:
+        titles (pd.Series): Market titles.
+        reference (date): Date used to pick the nearest year. Defaults to today.
+        context_years (pd.Series): Optional year per row, aligned with titles.
+    Returns:
+        pd.Series: YYYY-MM-DD strings, "" where no date was found.
+    """
+    titles = titles.fillna("").astype(str)
+    # Titles repeat across wallets, so parse each distinct title once and broadcast back
+    codes, unique_titles = pd.factorize(titles)
+    parsed = pd.DataFrame([parse_title_date(title) for title in unique_titles], columns=['year', 'month', 'day'],
+        dtype=float).iloc[codes].set_index(titles.index)
+    month, day, title_year = parsed['month'], parsed['day'], parsed['year']
+    year = title_year if context_years is None else title_year.fillna(context_years)
+
+    # Nearest of the reference year +/- 1 for dates with no year of their own
+    reference = pd.Timestamp(reference or date.today())
+    candidates = [reference.year - 1, reference.year, reference.year + 1]
+    distance = np.column_stack([
+        (pd.to_datetime(pd.DataFrame({'year': candidate, 'month': month, 'day': day}), errors='coerce') - reference)
+        .abs().dt.days.fillna(np.inf).to_numpy() for candidate in candidates])
+    nearest = pd.Series(np.array(candidates)[distance.argmin(axis=1)], index=titles.index)
+    year = year.fillna(nearest.where(np.isfinite(distance.min(axis=1))))
+
+    dates = pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': day}), errors='coerce').dt.strftime('%Y-%m-%d')
+    year_only = title_year.where(month.isna()).dropna().astype(int).astype(str) + "-12-31"  # Default to Dec 31 if only year is found
+    return dates.fillna(year_only).fillna("")
@@ -0,0 +1,165 @@
+"""
+Portfolio history: every computed snapshot is appended as a small Parquet part
+file, partitioned by day, and range queries downsample while scanning so months
+of history never have to be loaded row by row.
+"""
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+DEFAULT_HISTORY_PATH = os.environ.get("PL_MARKET_HISTORY", os.path.join(".cache", "pnl_history"))
+HISTORY_INTERVAL = 60  # seconds between snapshots of the same set of wallets
+HISTORY_METRICS = ["value", "pnl"]  # plus every liquidation_N% column
+
+
+def history_columns(df):
+    """The per-position metric columns a snapshot keeps."""
+    return HISTORY_METRICS + [column for column in df.columns if column.startswith("liquidation_")]
+
+def _utc(ts):
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+def bucket_for(span):
+    """A bucket size that keeps a chart of `span` at a few hundred points."""
+    for bucket in ("1min", "5min", "15min", "1h", "6h", "1D"):
+        if span / pd.Timedelta(bucket) <= 500:
+            return bucket
+    return "1W"
+
+def running_totals(rows, metrics, by=None):
+    """
+    Totals per snapshot time (and `by` value) with every wallet counted at its
+    latest snapshot, so wallets recorded at different times still add up to
+    the whole portfolio instead of alternating partial sums.
+    Args:
+        rows (pd.DataFrame): ts, wallet, the `by` column and metrics, one row per
+                             wallet (and `by` value) per snapshot.
+    Returns:
+        pd.DataFrame: ts, the `by` column and the metric totals.
+    """
+    series = ["wallet"] + ([by] if by else [])
+    rows = rows.sort_values("ts", kind="stable")
+    # A series missing from its wallet's next snapshot (e.g. a closed position) drops to zero there
+    snapshots = rows[["wallet", "ts"]].drop_duplicates()
+    snapshots["next_ts"] = snapshots.groupby("wallet")["ts"].shift(-1)
+    rows = rows.merge(snapshots, on=["wallet", "ts"], how="left")
+    gone = rows[rows["next_ts"].notna() & (rows.groupby(series)["ts"].shift(-1) != rows["next_ts"])]
+    zeros = gone[series].assign(ts=gone["next_ts"], **{metric: 0.0 for metric in metrics})
+    rows = pd.concat([rows[["ts"] + series + metrics], zeros], ignore_index=True).sort_values("ts", kind="stable")
+
+    # Each series adds its change since its previous snapshot; the running sum is the total
+    deltas = rows[metrics] - rows.groupby(series)[metrics].shift(fill_value=0)
+    totals = deltas.groupby([rows[key] for key in ["ts"] + ([by] if by else [])]).sum()
+    return (totals.groupby(level=by).cumsum() if by else totals.cumsum()).reset_index()
+
+
+class HistoryStore:
+    """
+    Append-only snapshots of build_view_model output under
+    path/day=YYYY-MM-DD/part-*.parquet. Each set of wallets is recorded at
+    most once per `interval` seconds, all under one timestamp; finished days
+    are compacted into a single file.
+    """
+    def __init__(self, path=DEFAULT_HISTORY_PATH, interval=HISTORY_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._last_append = {}  # frozenset of wallets -> time of their last snapshot
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def append(self, df, at=None):
+        """
+        Writes every row of the frame if its set of wallets is due for a snapshot.
+        Returns:
+            int: number of rows written.
+        """
+        if df.empty:
+            return 0
+        now = time.time() if at is None else pd.Timestamp(at).timestamp()
+        wallets = frozenset(df['wallet'].dropna().unique())
+        with self._lock:
+            if now - self._last_append.get(wallets, float("-inf")) < self.interval:
+                return 0
+            self._last_append[wallets] = now
+        rows = df.loc[df['wallet'].isin(wallets), ["wallet", "asset", "market"] + history_columns(df)].reset_index(drop=True)
+        ts = pd.Timestamp(now, unit="s", tz="UTC")
+        rows.insert(0, "ts", ts)
+        day = ts.strftime("%Y-%m-%d")
+        directory = os.path.join(self.path, f"day={day}")
+        os.makedirs(directory, exist_ok=True)
+        rows.to_parquet(os.path.join(directory, f"part-{int(now * 1000)}-{uuid.uuid4().hex[:8]}.parquet"), index=False)
+        self.compact(before=day)
+        return len(rows)
+
+    def compact(self, before=None):
+        """Merges the part files of each day before `before` (YYYY-MM-DD) into one file."""
+        import pyarrow.parquet as pq
+
+        for entry in sorted(os.listdir(self.path)):
+            day = entry.partition("=")[2]
+            directory = os.path.join(self.path, entry)
+            if not day or (before is not None and day >= before) or not os.path.isdir(directory):
+                continue
+            parts = sorted(name for name in os.listdir(directory) if name.startswith("part-"))
+            if len(parts) < 2:
+                continue
+            table = pq.read_table([os.path.join(directory, name) for name in parts], partitioning=None)
+            tmp = os.path.join(directory, f".compacted-{uuid.uuid4().hex[:8]}.tmp")
+            pq.write_table(table, tmp)
+            os.replace(tmp, os.path.join(directory, f"part-{parts[0][5:]}"))
+            for name in parts[1:]:
+                os.remove(os.path.join(directory, name))
+
+    def query(self, start=None, end=None, bucket="1h", wallets=None, by=None, metrics=None):
+        """
+        Portfolio totals between start and end, downsampled to one row per
+        bucket (and per `by` column, e.g. "wallet" or "market").
+        Args:
+            metrics (list): metric columns to aggregate; all stored ones by default.
+        Returns:
+            pd.DataFrame: ts (bucket start), the `by` column, and
+                          <metric>_min / <metric>_max / <metric>_last per metric.
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if not any(entry.startswith("day=") for entry in os.listdir(self.path)):
+            return pd.DataFrame()
+        dataset = ds.dataset(self.path, format="parquet", partitioning=ds.partitioning(pa.schema([("day", pa.string())]), flavor="hive"))
+        keys = ["ts"] + ([by] if by else [])
+        row_keys = ["ts", "wallet"] + ([by] if by and by != "wallet" else [])
+        metrics = [column for column in (metrics or dataset.schema.names)
+            if column in dataset.schema.names and (column in HISTORY_METRICS or column.startswith("liquidation_"))]
+
+        # Day partitions outside the range are skipped without being opened
+        ts_type = pa.timestamp("us", tz="UTC")
+        condition = ds.scalar(True)
+        if start is not None:
+            start = _utc(start)
+            condition &= (ds.field("day") >= start.strftime("%Y-%m-%d")) & (ds.field("ts") >= pa.scalar(start, type=ts_type))
+        if end is not None:
+            end = _utc(end)
+            condition &= (ds.field("day") <= end.strftime("%Y-%m-%d")) & (ds.field("ts") <= pa.scalar(end, type=ts_type))
+        if wallets is not None:
+            condition &= ds.field("wallet").isin(list(wallets))
+
+        # Sum positions into per-wallet snapshot totals one record batch at a time;
+        # a snapshot split across batches is re-summed below
+        partials = []
+        for batch in dataset.to_batches(columns=row_keys + metrics, filter=condition):
+            if batch.num_rows:
+                partials.append(batch.to_pandas().groupby(row_keys, sort=False)[metrics].sum())
+        if not partials:
+            return pd.DataFrame()
+        rows = pd.concat(partials).groupby(level=row_keys).sum().reset_index()
+        snapshots = rows if by == "wallet" else running_totals(rows, metrics, by)
+        snapshots = snapshots.sort_values(keys).reset_index(drop=True)
+
+        snapshots["ts"] = snapshots["ts"].dt.floor(bucket)
+        downsampled = snapshots.groupby(keys)[metrics].agg(["min", "max", "last"])
+        downsampled.columns = [f"{metric}_{stat}" for metric, stat in downsampled.columns]
+        return downsampled.reset_index()
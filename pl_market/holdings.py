@@ -0,0 +1,121 @@
+"""Wallet holdings from the Polymarket data API."""
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from typing import List
+
+import pandas as pd
+import requests
+
+from .resilience import CircuitBreaker, Deadline, call_upstream, hedge_delay
+from .tracing import span
+
+DATA_API_URL = "https://data-api.polymarket.com"
+POSITIONS_PAGE_SIZE = 500
+FETCH_WORKERS = 8
+REQUEST_TIMEOUT = 10  # seconds, per HTTP call
+HOLDINGS_TTL = 60  # seconds before holdings are refetched
+HOLDINGS_DEADLINE = 20  # seconds for one fetch of all wallets, retries included
+
+data_api_breaker = CircuitBreaker("data-api")
+
+def make_http_session():
+    """Keep-alive session to share between fetches, sized for the worker pool."""
+    session = requests.Session()
+    # room for a hedged duplicate per worker
+    adapter = requests.adapters.HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=2 * FETCH_WORKERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def fetch_positions_page(session, address, offset, timeout=REQUEST_TIMEOUT):
+    with span("positions_api") as request:
+        response = session.get(f"{DATA_API_URL}/positions",
+            params={"user": address, "limit": POSITIONS_PAGE_SIZE, "offset": offset},
+            timeout=timeout)
+        request.set(status=response.status_code)
+        response.raise_for_status()
+        page = response.json()
+        request.set(rows=len(page))
+    return page
+
+def fetch_wallet_positions(session, address, deadline=None):
+    """
+    Fetches every position for one wallet, following limit/offset pagination
+    until a short page comes back. Each page is retried, hedged and bounded
+    by the deadline (see call_upstream).
+    """
+    positions = []
+    offset = 0
+    while True:
+        page = call_upstream(partial(fetch_positions_page, session, address, offset), breaker=data_api_breaker,
+            deadline=deadline, timeout=REQUEST_TIMEOUT, hedge_after=hedge_delay("positions_api"))
+        positions.extend(page)
+        if len(page) < POSITIONS_PAGE_SIZE:
+            return positions
+        offset += POSITIONS_PAGE_SIZE
+
+def fetch_positions(wallet_addresses, session=None, deadline=None):
+    """
+    Fetches the raw positions of all wallets concurrently over one keep-alive
+    session, giving up on whatever hasn't answered by the deadline
+    (HOLDINGS_DEADLINE seconds by default).
+    Returns:
+        tuple: (positions_by_wallet, errors) where errors maps each wallet that
+               failed or ran out of time to its error message.
+    """
+    session = session or make_http_session()
+    deadline = deadline or Deadline(HOLDINGS_DEADLINE)
+    results, errors = {}, {}
+    if not wallet_addresses:
+        return results, errors
+
+    pool = ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(wallet_addresses)))
+    futures = {pool.submit(fetch_wallet_positions, session, address, deadline): address for address in wallet_addresses}
+    wait(futures, timeout=deadline.remaining())
+    pool.shutdown(wait=False, cancel_futures=True)  # stragglers finish in the background, unheard
+    for future, address in futures.items():
+        if not future.done():
+            errors[address] = f"no answer within the {deadline.seconds}s deadline"
+            continue
+        try:
+            results[address] = future.result()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            errors[address] = str(e)
+    return results, errors
+
+def holdings_frame(positions_by_wallet, wallet_addresses):
+    """Combines raw positions into the holdings DataFrame, wallets in the order given."""
+    all_holdings = []
+    for address in wallet_addresses:
+        df = pd.DataFrame(positions_by_wallet.get(address, []))
+        if not df.empty:
+            df['risk'] = df['initialValue'].round(2)
+            df['avgPrice'] = df['avgPrice'].round(2)
+            df['curPrice'] = df['curPrice'].round(2)
+            df['reward'] = df['size'] - df['initialValue'] + df['realizedPnl']
+            df['%_return'] = ((df['reward'] / df['initialValue']) * 100).round(2)
+            df['market_link'] = "https://polymarket.com/event/" + df['eventSlug']
+            all_holdings.append(df)
+
+    if all_holdings:
+        return pd.concat(all_holdings, ignore_index=True)
+    else:
+        return pd.DataFrame()
+
+def load_positions(wallet_addresses, session=None, store=None):
+    """fetch_positions that also saves what it got to a SnapshotStore; the Refresher's loader for holdings."""
+    positions, errors = fetch_positions(wallet_addresses, session)
+    if store is not None and positions:
+        store.save_holdings(positions)
+    return positions, errors
+
+def fetch_holdings(wallet_addresses: List[str], session=None):
+    """
+    Fetches all wallets concurrently over one keep-alive session.
+    Returns:
+        tuple: (holdings_df, errors) where errors maps each wallet that failed
+               to its error message. Wallets that succeeded are still returned.
+    """
+    addresses = list(dict.fromkeys(addr for addr in wallet_addresses if addr))
+    positions, errors = fetch_positions(addresses, session)
+    return holdings_frame(positions, addresses), errors
@@ -0,0 +1,200 @@
+"""Liquidation values from selling positions into the bid side of their books."""
+import numpy as np
+import pandas as pd
+
+from .tracing import span
+
+PERCENT_LIST = [0.25, 0.50, 0.75, 1]
+
+def build_bid_ladders(order_books_dict):
+    """
+    Collects the running totals the liquidation engine searches over from each
+    OrderBook (bids are already sorted best price first).
+    Returns a dict of asset_id -> (prices, cumulative_size, cumulative_notional).
+    """
+    return {asset_id: (book.bid_price, np.cumsum(book.bid_size), book.bid_notional)
+        for asset_id, book in order_books_dict.items()}
+
+def liquidate_positions(sizes, assets, ladders, percent_list):
+    """
+    Sells `percent` of every position into its bid ladder, for all assets and
+    percentages in one batched searchsorted per book.
+    Args:
+        sizes (array-like): Position sizes in shares.
+        assets (array-like): Asset id of each position.
+        ladders (dict): Output of build_bid_ladders.
+        percent_list (list): Fractions of each position to sell.
+    Returns:
+        tuple: (sell_prices, sell_values), each shaped (positions, percents).
+               The sell price is the last level touched; positions without a
+               book (or with nothing to sell) get 0 for both.
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    percents = np.asarray(percent_list, dtype=float)
+    targets = sizes[:, None] * percents[None, :]
+    sell_prices = np.zeros_like(targets)
+    sell_values = np.zeros_like(targets)
+
+    rows_by_asset = pd.Series(np.arange(len(sizes))).groupby(np.asarray(assets), sort=False).indices
+    for asset_id, rows in rows_by_asset.items():
+        ladder = ladders.get(asset_id)
+        if ladder is None or len(ladder[0]) == 0:
+            continue
+        target = targets[rows]
+        price, value = walk_ladder(ladder, target)
+        selling = target > 0
+        sell_prices[rows] = np.where(selling, price, 0.0)
+        sell_values[rows] = np.where(selling, value, 0.0)
+
+    return sell_prices, sell_values
+
+def walk_ladder(ladder, quantities):
+    """
+    What selling each quantity into a fresh bid ladder fetches.
+    Returns:
+        tuple: (price of the last level touched, proceeds), shaped like quantities.
+               Quantities beyond the book's depth get everything the book holds.
+    """
+    prices, cum_size, cum_notional = ladder
+    # First level whose running size covers the quantity; past the end means the book runs dry
+    level = np.searchsorted(cum_size, quantities, side='left')
+    exhausted = level >= len(prices)
+    level = np.minimum(level, len(prices) - 1)
+    size_before = np.where(level > 0, cum_size[level - 1], 0.0)
+    notional_before = np.where(level > 0, cum_notional[level - 1], 0.0)
+    value = np.where(exhausted, cum_notional[-1], notional_before + (quantities - size_before) * prices[level])
+    return prices[level], value
+
+def liquidate_shared(sizes, assets, ladders, percent_list, allocation="pro_rata"):
+    """
+    Like liquidate_positions, but every position holding an asset sells into
+    the same book: each book is walked once for the combined size and the
+    proceeds are split back per position.
+    Args:
+        allocation (str): "pro_rata" gives every position the blended fill of
+            the combined sale in proportion to its size; "priority" fills
+            positions in row order (e.g. wallets in the order they were given),
+            each starting where the previous one left the book.
+    Returns:
+        tuple: (sell_prices, sell_values), each shaped (positions, percents).
+    """
+    sizes = np.asarray(sizes, dtype=float)
+    percents = np.asarray(percent_list, dtype=float)
+    targets = sizes[:, None] * percents[None, :]
+    sell_prices = np.zeros_like(targets)
+    sell_values = np.zeros_like(targets)
+
+    rows_by_asset = pd.Series(np.arange(len(sizes))).groupby(np.asarray(assets), sort=False).indices
+    for asset_id, rows in rows_by_asset.items():
+        ladder = ladders.get(asset_id)
+        if ladder is None or len(ladder[0]) == 0:
+            continue
+        target = targets[rows]
+        if allocation == "priority":
+            # Each position sells from the cumulative size of the ones ahead of it
+            end = np.cumsum(target, axis=0)
+            _, start_value = walk_ladder(ladder, end - target)
+            price, end_value = walk_ladder(ladder, end)
+            value = end_value - start_value
+        elif allocation == "pro_rata":
+            combined = target.sum(axis=0)
+            price, combined_value = walk_ladder(ladder, combined)
+            share = np.divide(target, combined, out=np.zeros_like(target), where=combined > 0)
+            price, value = np.broadcast_to(price, target.shape), share * combined_value
+        else:
+            raise ValueError(f"unknown allocation: {allocation!r} (use 'pro_rata' or 'priority')")
+        selling = target > 0
+        sell_prices[rows] = np.where(selling, price, 0.0)
+        sell_values[rows] = np.where(selling, value, 0.0)
+
+    return sell_prices, sell_values
+
+def set_liquidation_columns(stock_info_df, order_books_dict, percent_list, allocation=None):
+    """
+    Writes the sell_price_/total_sell_value_/market_pnl_ columns for every row
+    in place. With an allocation ("pro_rata" or "priority") positions holding
+    the same asset share its book, see liquidate_shared.
+    """
+    ladders = build_bid_ladders(order_books_dict)
+    if allocation:
+        sell_prices, sell_values = liquidate_shared(stock_info_df['size'], stock_info_df['asset'], ladders, percent_list, allocation)
+    else:
+        sell_prices, sell_values = liquidate_positions(stock_info_df['size'], stock_info_df['asset'], ladders, percent_list)
+    has_book = stock_info_df['asset'].isin(ladders.keys()).to_numpy()
+    stock_info_df['has_book'] = has_book  # liquidation columns are 0 where the book is missing
+    risk = stock_info_df['risk'].to_numpy(dtype=float)
+
+    for i, percent in enumerate(percent_list):
+        pct_label = int(percent * 100)
+        stock_info_df[f'sell_price_{pct_label}%'] = sell_prices[:, i]
+        stock_info_df[f'total_sell_value_{pct_label}%'] = sell_values[:, i]
+        stock_info_df[f'market_pnl_{pct_label}%'] = np.where(has_book, sell_values[:, i] - risk * percent, 0.0)
+
+    if not stock_info_df['size'].fillna(0).astype(float).eq(0).all():
+        stock_info_df['sell_price_100%'] = (stock_info_df['total_sell_value_100%'] / stock_info_df['size']).round(2)
+    else:
+        stock_info_df['sell_price_100%'] = 0.0
+    return stock_info_df
+
+def add_partial_sell_prices(stock_info_df, order_books_dict, percent_list, allocation=None):
+    if stock_info_df.empty:
+        return stock_info_df
+    stock_info_df['asset'] = stock_info_df['asset'].astype(str)
+    with span("liquidation", rows=len(stock_info_df), books=len(order_books_dict)):
+        return set_liquidation_columns(stock_info_df, order_books_dict, percent_list, allocation)
+
+def shares_for_proceeds(ladder, proceeds):
+    """Shares to sell into the ladder to raise `proceeds`; capped at the book's depth."""
+    prices, cum_size, cum_notional = ladder
+    level = np.minimum(np.searchsorted(cum_notional, proceeds, side='left'), len(prices) - 1)
+    size_before = np.where(level > 0, cum_size[level - 1], 0.0)
+    notional_before = np.where(level > 0, cum_notional[level - 1], 0.0)
+    return np.minimum(size_before + (proceeds - notional_before) / prices[level], cum_size[-1])
+
+def depth_curves(stock_info_df, order_books_dict, grid, unit="percent"):
+    """
+    Liquidation curve of every position on a grid of sizes, from one batched
+    search per book over its cumulative depth.
+    Args:
+        grid (array-like): Fractions of each position to sell (unit="percent",
+            e.g. np.linspace(0.01, 1, 100)) or proceeds in USD to raise (unit="usd").
+    Returns:
+        pd.DataFrame: One row per position and grid point with asset, grid,
+            shares (sold, capped at the position and the book), proceeds,
+            avg_price, last_price, and slippage / slippage_pct of the average
+            fill against curPrice. Positions without a book are left out.
+    """
+    grid = np.asarray(grid, dtype=float)
+    if stock_info_df.empty or not len(grid):
+        return pd.DataFrame()
+    ladders = build_bid_ladders(order_books_dict)
+    sizes = stock_info_df['size'].to_numpy(dtype=float)
+    assets = stock_info_df['asset'].astype(str).to_numpy()
+
+    curves = []
+    rows_by_asset = pd.Series(np.arange(len(sizes))).groupby(assets, sort=False).indices
+    for asset_id, rows in rows_by_asset.items():
+        ladder = ladders.get(asset_id)
+        if ladder is None or len(ladder[0]) == 0:
+            continue
+        if unit == "percent":
+            shares = sizes[rows, None] * grid[None, :]
+        elif unit == "usd":
+            shares = np.minimum(sizes[rows, None], shares_for_proceeds(ladder, grid)[None, :])
+        else:
+            raise ValueError(f"unknown unit: {unit!r} (use 'percent' or 'usd')")
+        shares = np.minimum(shares, ladder[1][-1])
+        last_price, proceeds = walk_ladder(ladder, shares)
+        curves.append((np.repeat(rows, len(grid)), np.tile(grid, len(rows)), shares.ravel(), proceeds.ravel(), last_price.ravel()))
+    if not curves:
+        return pd.DataFrame()
+
+    rows, grid_values, shares, proceeds, last_price = (np.concatenate(parts) for parts in zip(*curves))
+    avg_price = np.divide(proceeds, shares, out=np.full_like(proceeds, np.nan), where=shares > 0)
+    cur_price = stock_info_df['curPrice'].to_numpy(dtype=float)[rows]
+    curves_df = pd.DataFrame({"asset": assets[rows], "grid": grid_values, "shares": shares, "proceeds": proceeds,
+        "avg_price": avg_price, "last_price": np.where(shares > 0, last_price, np.nan),
+        "slippage": cur_price - avg_price,
+        "slippage_pct": np.divide((cur_price - avg_price) * 100, cur_price, out=np.full_like(avg_price, np.nan), where=cur_price > 0)},
+        index=stock_info_df.index[rows])
+    return curves_df
@@ -0,0 +1,284 @@
+"""Live order books kept current from the CLOB market websocket (or a recorded replay)."""
+import json
+import random
+import threading
+import time
+
+import numpy as np
+
+from .books import OrderBook
+from .liquidation import set_liquidation_columns
+
+MARKET_WS_URL = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+RECONNECT_BASE = 1.0  # seconds; reconnect n waits uniform(0, min(RECONNECT_MAX, RECONNECT_BASE * 2**n))
+RECONNECT_MAX = 60.0
+
+class MarketFeed:
+    """
+    Streams market-channel messages (book snapshots and price_change deltas)
+    for a set of asset ids from the CLOB websocket. Iterating yields one
+    message dict at a time until close() is called.
+    """
+    def __init__(self, asset_ids, url=MARKET_WS_URL, ping_interval=10):
+        self.asset_ids = list(asset_ids)
+        self.url = url
+        self.ping_interval = ping_interval
+        self.closed = False
+        self._ws = None
+
+    def __iter__(self):
+        import websocket  # websocket-client, only needed in live mode
+
+        ws = self._ws = websocket.create_connection(self.url, timeout=self.ping_interval)
+        try:
+            ws.send(json.dumps({"assets_ids": self.asset_ids, "type": "market"}))
+            while not self.closed:
+                try:
+                    raw = ws.recv()
+                except websocket.WebSocketTimeoutException:
+                    ws.send("PING")  # keepalive, the server answers "PONG"
+                    continue
+                if not raw or raw == "PONG":
+                    continue
+                payload = json.loads(raw)
+                yield from (payload if isinstance(payload, list) else [payload])
+        finally:
+            ws.close()
+
+    def close(self):
+        self.closed = True
+        if self._ws is not None:
+            self._ws.close()  # wakes a reader blocked in recv()
+
+class ReplayFeed:
+    """
+    Local stand-in for MarketFeed that replays recorded market-channel
+    messages, either a list of dicts or a JSONL file written by record_feed.
+    With speed=None messages are served back to back; otherwise the gaps
+    between their timestamps (ms) are replayed, divided by speed.
+    """
+    def __init__(self, messages, speed=None):
+        self.messages = messages
+        self.speed = speed
+        self.closed = False
+
+    def _load(self):
+        if isinstance(self.messages, (str, bytes)):
+            with open(self.messages) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        return list(self.messages)
+
+    def __iter__(self):
+        last_ts = None
+        for message in self._load():
+            if self.closed:
+                return
+            ts = message.get('timestamp')
+            if self.speed and ts is not None:
+                if last_ts is not None:
+                    time.sleep(max(0.0, (int(ts) - last_ts) / 1000 / self.speed))
+                last_ts = int(ts)
+            yield message
+
+    def close(self):
+        self.closed = True
+
+def record_feed(feed, path, limit=None):
+    """Appends messages from a feed to a JSONL file for later use with ReplayFeed."""
+    with open(path, 'a') as f:
+        for count, message in enumerate(feed, 1):
+            f.write(json.dumps(message) + "\n")
+            if limit is not None and count >= limit:
+                feed.close()
+                break
+
+class LiveOrderBooks:
+    """
+    In-memory books per asset kept current from a market feed. Each side is a
+    price -> size map; the OrderBook for an asset is rebuilt only when one of
+    its levels changes.
+    """
+    def __init__(self, books=None):
+        self._levels = {}  # asset_id -> {'bid': {price: size}, 'ask': {price: size}}
+        self._meta = {}  # asset_id -> (market, timestamp, hash)
+        self.books = {}
+        self._lock = threading.Lock()
+        for book in (books or {}).values():
+            self.apply_snapshot(book.asset_id, zip(book.bid_price, book.bid_size), zip(book.ask_price, book.ask_size),
+                market=book.market, timestamp=book.timestamp, hash=book.hash)
+
+    def _rebuild(self, asset_id):
+        bids, asks = self._levels[asset_id]['bid'], self._levels[asset_id]['ask']
+        market, timestamp, hash = self._meta[asset_id]
+        self.books[asset_id] = OrderBook(asset_id, list(bids), list(bids.values()), list(asks), list(asks.values()),
+            market=market, timestamp=timestamp, hash=hash)
+
+    def apply_snapshot(self, asset_id, bids, asks, market=None, timestamp=None, hash=None):
+        """Replaces an asset's book. bids/asks are (price, size) pairs or {'price', 'size'} dicts."""
+        def to_levels(levels):
+            merged = {}
+            for level in levels:
+                price, size = (level['price'], level['size']) if isinstance(level, dict) else level
+                if float(size) > 0:
+                    # a price listed twice is one level, as the REST walk treats it
+                    merged[float(price)] = merged.get(float(price), 0.0) + float(size)
+            return merged
+
+        with self._lock:
+            self._levels[asset_id] = {'bid': to_levels(bids), 'ask': to_levels(asks)}
+            self._meta[asset_id] = (market, timestamp, hash)
+            self._rebuild(asset_id)
+
+    def apply_delta(self, asset_id, side, price, size, timestamp=None, hash=None):
+        """
+        Sets one price level (size 0 removes it). side is 'BUY'/'SELL' as sent by
+        the feed, or 'bid'/'ask'. Deltas for assets without a snapshot are ignored.
+        Returns True if the book changed.
+        """
+        book_side = 'bid' if side.upper() in ('BUY', 'BID') else 'ask'
+        with self._lock:
+            levels = self._levels.get(asset_id)
+            if levels is None:
+                return False
+            price, size = float(price), float(size)
+            if size > 0:
+                levels[book_side][price] = size
+            else:
+                levels[book_side].pop(price, None)
+            market, old_timestamp, old_hash = self._meta[asset_id]
+            self._meta[asset_id] = (market, timestamp or old_timestamp, hash or old_hash)
+            self._rebuild(asset_id)
+        return True
+
+    def handle_message(self, message):
+        """Applies one market-channel message and returns the set of asset ids it changed."""
+        event = message.get('event_type')
+        if event == 'book':
+            self.apply_snapshot(message['asset_id'], message.get('bids') or message.get('buys') or [],
+                message.get('asks') or message.get('sells') or [],
+                market=message.get('market'), timestamp=message.get('timestamp'), hash=message.get('hash'))
+            return {message['asset_id']}
+        if event == 'price_change':
+            changes = message.get('price_changes')
+            if changes is None:  # older shape: one asset with a list of changes
+                changes = [dict(change, asset_id=message['asset_id']) for change in message.get('changes', [])]
+            changed = set()
+            for change in changes:
+                if self.apply_delta(change['asset_id'], change['side'], change['price'], change['size'],
+                        timestamp=message.get('timestamp'), hash=change.get('hash')):
+                    changed.add(change['asset_id'])
+            return changed
+        return set()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.books)
+
+class LiveLiquidation:
+    """
+    Positions with their liquidation columns, recomputed only for the rows
+    holding an asset whose book changed.
+    """
+    def __init__(self, stock_info_df, order_books_dict, percent_list, allocation=None):
+        self.percent_list = percent_list
+        self.allocation = allocation
+        positions = stock_info_df.copy()
+        positions['asset'] = positions['asset'].astype(str)
+        self._position_columns = positions.columns
+        self.positions = set_liquidation_columns(positions, order_books_dict, percent_list, allocation)
+        self._rows_by_asset = self.positions.groupby('asset').indices
+        self._lock = threading.Lock()
+
+    def update(self, order_books_dict, asset_ids):
+        rows = [self._rows_by_asset[asset_id] for asset_id in asset_ids if asset_id in self._rows_by_asset]
+        if not rows:
+            return
+        rows = np.concatenate(rows)
+        with self._lock:
+            # every row of a changed asset is recomputed, so shared allocations stay whole
+            affected = set_liquidation_columns(self.positions.iloc[rows].copy(), order_books_dict, self.percent_list, self.allocation)
+            for column in affected.columns.difference(self._position_columns):
+                self.positions.iloc[rows, self.positions.columns.get_loc(column)] = affected[column].to_numpy()
+
+    def snapshot(self):
+        with self._lock:
+            return self.positions.copy()
+
+def follow_feed(feed, live_books, liquidation=None):
+    """Applies every message from the feed, refreshing the affected positions as books change."""
+    for message in feed:
+        changed = live_books.handle_message(message)
+        if changed and liquidation is not None:
+            liquidation.update(live_books.snapshot(), changed)
+
+class LivePortfolio:
+    """
+    LiveOrderBooks and LiveLiquidation for a set of positions, kept current by
+    a feed on a background thread. When the feed drops it's reopened with
+    jittered backoff; the books count as stale from the failure until the
+    new connection delivers its first message (the market channel starts
+    with a book snapshot per asset). Malformed messages are skipped.
+    Args:
+        feed_factory: called with the asset ids to open a feed, MarketFeed
+                      by default (a ReplayFeed for tests and offline runs).
+    """
+    def __init__(self, stock_info_df, order_books_dict, percent_list, allocation=None, feed_factory=MarketFeed):
+        self.asset_ids = list(dict.fromkeys(stock_info_df['asset'].astype(str)))
+        self.books = LiveOrderBooks(order_books_dict)
+        self.liquidation = LiveLiquidation(stock_info_df, self.books.snapshot(), percent_list, allocation)
+        self.feed_factory = feed_factory
+        self.stale_since = None
+        self.error = None
+        self.messages = 0
+        self.reconnects = 0
+        self.skipped_messages = 0
+        self._feed = None
+        self._stop = threading.Event()
+
+    @property
+    def stale(self):
+        return self.stale_since is not None
+
+    def _follow(self, feed):
+        for message in feed:
+            self.messages += 1
+            self.stale_since = None
+            try:
+                changed = self.books.handle_message(message)
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                self.skipped_messages += 1
+                self.error = f"skipped a malformed message: {e!r}"
+                continue
+            if changed:
+                self.liquidation.update(self.books.snapshot(), changed)
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            received = self.messages
+            try:
+                self._feed = self.feed_factory(self.asset_ids)
+                if self._stop.is_set():  # closed while the feed was being opened
+                    break
+                self._follow(self._feed)
+                if self._stop.is_set():
+                    break
+                raise ConnectionError("feed ended")
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                self.error = f"{type(e).__name__}: {e}"
+                self.stale_since = self.stale_since or time.time()
+            # A connection that delivered something starts the backoff over
+            failures = 0 if self.messages > received else failures + 1
+            self.reconnects += 1
+            self._stop.wait(random.uniform(0, min(RECONNECT_MAX, RECONNECT_BASE * 2 ** failures)))
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="live-feed").start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._feed is not None:
+            self._feed.close()
@@ -0,0 +1,85 @@
+"""
+Portfolio pipeline shared by the dashboard and the batch CLI: holdings ->
+open positions -> order books -> liquidation -> view model and totals.
+"""
+import pandas as pd
+
+from .dates import extract_end_dates
+from .risk import classify_risk_from_prices
+from .tracing import span
+
+
+def open_positions(holdings_df):
+    """Positions that haven't resolved yet (nothing to redeem)."""
+    if holdings_df.empty:
+        return pd.DataFrame()
+    return holdings_df[holdings_df['redeemable'] == False].reset_index(drop=True)
+
+def build_view_model(stock_info_df):
+    """Everything the dashboard views need, computed once per data refresh."""
+    # Apply the mapping to create the 'risk' and 'probability_range' columns
+    risk = classify_risk_from_prices(stock_info_df['curPrice'])
+    stock_info_df['risk_range'] = risk['label']
+    stock_info_df['probability_range'] = risk['range']
+
+    # Titles without an endDate borrow the year of another market in the same event when there is one
+    end_date = stock_info_df['endDate'].fillna("").astype(str)
+    event_year = pd.to_datetime(end_date.str[:10], format='%Y-%m-%d', errors='coerce').dt.year.groupby(stock_info_df['eventSlug']).transform('max')
+    end_dates = end_date.where(end_date != "", extract_end_dates(stock_info_df['title'], context_years=event_year))
+    df = pd.DataFrame({"market": stock_info_df['title'],
+        "wallet": stock_info_df.get('proxyWallet'),
+        "asset": stock_info_df['asset'],
+        "outcome": stock_info_df['outcome'].str.capitalize(),
+        "shares": stock_info_df['size'].round(1),
+        "avg": (stock_info_df['avgPrice'] * 100).round(2),
+        "reward": stock_info_df['reward'].round(2),
+        "return_pct": stock_info_df['%_return'],
+        "risk": stock_info_df['risk'],
+        "current": (stock_info_df['curPrice'] * 100).round(2),
+        "value": stock_info_df['currentValue'].round(2),
+        # one liquidation_N% column per percentage add_partial_sell_prices was run with
+        **{column.replace('market_pnl_', 'liquidation_'): stock_info_df[column].round(2)
+            for column in stock_info_df.columns if column.startswith('market_pnl_')},
+        "initial_value": stock_info_df['initialValue'].round(2),
+        "pnl": (stock_info_df['currentValue'] - stock_info_df['initialValue']).round(2),
+        "liquidation pnl": stock_info_df['market_pnl_100%'].round(2),
+        "pnl_percent": stock_info_df['percentPnl'].round(2),
+        "icon": stock_info_df['icon'],
+        "market_link": stock_info_df['market_link'],
+        "risk_range": stock_info_df['risk_range'],
+        "end_date": end_dates,
+        "has_book": stock_info_df['has_book'] if 'has_book' in stock_info_df else True})
+    return df
+
+def portfolio_totals(df):
+    """The headline metrics shown above the dashboard."""
+    return {"total_risk": round(float(df['risk'].sum()), 2),
+        "total_value": round(float(df['value'].sum()), 2),
+        "market_value": round(float(df['liquidation_100%'].sum()), 2),
+        "total_pnl": round(float(df['pnl'].sum()), 2)}
+
+def compute_portfolio(wallet_addresses, percent_list=None, session=None, client=None, cache=None, allocation=None):
+    """
+    Runs the whole pipeline for a list of wallets without Streamlit. Books come
+    from the public CLOB endpoint unless a client (e.g. make_clob_client()) is given.
+    allocation ("pro_rata" or "priority") makes wallets holding the same asset
+    share its book instead of each assuming the whole book.
+    Returns:
+        tuple: (view_model_df, totals, errors). errors maps wallets whose
+               holdings could not be fetched to the error message.
+    """
+    from .books import ClobBooksClient, fetch_order_books
+    from .holdings import fetch_holdings, make_http_session
+    from .liquidation import PERCENT_LIST, add_partial_sell_prices
+
+    session = session or make_http_session()
+    holdings_df, errors = fetch_holdings(wallet_addresses, session=session)
+    positions = open_positions(holdings_df)
+    if positions.empty:
+        return pd.DataFrame(), portfolio_totals(pd.DataFrame(columns=['risk', 'value', 'liquidation_100%', 'pnl'])), errors
+
+    order_books = fetch_order_books(positions['asset'].astype(str).tolist(), client or ClobBooksClient(session), cache)
+    stock_info_df = add_partial_sell_prices(positions.copy(), order_books, percent_list or PERCENT_LIST, allocation).sort_values(by='title', ascending=True)
+    with span("view_model", rows=len(stock_info_df)):
+        df = build_view_model(stock_info_df)
+    return df, portfolio_totals(df), errors
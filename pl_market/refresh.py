@@ -0,0 +1,177 @@
+"""
+Stale-while-revalidate refreshing for holdings and order books.
+
+A Refresher serves the last good value for a key immediately, re-polls the
+keys people are looking at shortly before they expire, and coalesces
+concurrent requests for the same key onto a single upstream call.
+"""
+import threading
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+
+from .tracing import span
+
+REFRESH_AHEAD = 0.8  # re-poll once a value is 80% of the way through its TTL
+RETRY_DELAY = 5  # seconds before retrying a key whose refresh failed
+IDLE_TIMEOUT = 600  # stop polling keys nobody has asked for in this many seconds
+
+_Kind = namedtuple("_Kind", "load ttl seed")
+
+
+class _Entry:
+    __slots__ = ("fetched_at", "value", "last_requested", "retry_at", "error")
+
+    def __init__(self, fetched_at, value, last_requested):
+        self.fetched_at = fetched_at
+        self.value = value
+        self.last_requested = last_requested
+        self.retry_at = 0.0
+        self.error = None  # why the latest refresh failed, until one succeeds
+
+
+class Refresher:
+    """
+    Keeps the last good value per (kind, key), e.g. ("holdings", wallet) or
+    ("books", asset_id). Each kind is registered with a batch loader
+    load(keys) -> (values, errors), a TTL, and optionally a seed(keys) ->
+    {key: (fetched_at, value)} used to warm keys from a SnapshotStore.
+    """
+    def __init__(self, tick=1.0, idle_timeout=IDLE_TIMEOUT, workers=4):
+        self.tick = tick
+        self.idle_timeout = idle_timeout
+        self._kinds = {}
+        self._entries = {}  # (kind, key) -> _Entry
+        self._inflight = {}  # (kind, key) -> Future of the load covering that key
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresher")
+        self._stop = threading.Event()
+
+    def register(self, kind, load, ttl, seed=None):
+        self._kinds[kind] = _Kind(load, ttl, seed)
+
+    def _load(self, kind, keys):
+        try:
+            values, errors = self._kinds[kind].load(keys)
+        except Exception as e:
+            values, errors = {}, {key: str(e) for key in keys}
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get((kind, key))
+                if key in values:
+                    self._entries[(kind, key)] = _Entry(now, values[key], entry.last_requested if entry else now)
+                elif entry is not None:
+                    entry.retry_at = now + RETRY_DELAY  # keep serving the last good value
+                    entry.error = errors.get(key, "not returned by upstream")
+                self._inflight.pop((kind, key), None)
+        return values, errors
+
+    def refresh(self, kind, keys):
+        """
+        Starts one load for the keys that aren't already being loaded and
+        returns {key: Future} covering every key asked for.
+        """
+        futures, todo = {}, []
+        with self._lock:
+            for key in keys:
+                future = self._inflight.get((kind, key))
+                if future is None:
+                    todo.append(key)
+                else:
+                    futures[key] = future
+            if todo:
+                future = self._pool.submit(self._load, kind, todo)
+                for key in todo:
+                    self._inflight[(kind, key)] = future
+                    futures[key] = future
+        return futures
+
+    def get_many(self, kind, keys, wait=True, timeout=None):
+        """
+        Returns (values, errors) for the keys. Known keys are answered from
+        memory (stale ones are refreshed in the background); keys never seen
+        before are seeded from the store if possible, otherwise loaded now,
+        sharing any load already in flight. With wait=False unknown keys are
+        only scheduled and reported as errors; with a timeout, loads still
+        running after it are reported as errors and land in memory for the next call.
+        """
+        spec = self._kinds[kind]
+        now = time.time()
+        with self._lock:
+            unknown = [key for key in keys if (kind, key) not in self._entries]
+        if unknown and spec.seed is not None:
+            seeded = spec.seed(unknown)
+            with self._lock:
+                for key, (fetched_at, value) in seeded.items():
+                    self._entries.setdefault((kind, key), _Entry(fetched_at, value, now))
+
+        values, errors, missing, stale = {}, {}, [], []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get((kind, key))
+                if entry is None:
+                    missing.append(key)
+                    continue
+                entry.last_requested = now
+                values[key] = entry.value
+                if now - entry.fetched_at >= spec.ttl and now >= entry.retry_at:
+                    stale.append(key)
+        if stale:
+            self.refresh(kind, stale)
+
+        with span(f"refresher_{kind}", cache_hits=len(values) - len(stale), cache_stale=len(stale), cache_misses=len(missing)):
+            if missing:
+                futures = self.refresh(kind, missing)
+                if not wait:
+                    return values, {**errors, **{key: "loading" for key in missing}}
+                done, _ = wait_futures(set(futures.values()), timeout=timeout)
+                for key, future in futures.items():
+                    if future not in done:
+                        errors[key] = f"still loading after {timeout}s"
+                        continue
+                    loaded, failed = future.result()
+                    if key in loaded:
+                        values[key] = loaded[key]
+                    else:
+                        errors[key] = failed.get(key, "not returned by upstream")
+        return values, errors
+
+    def ages(self, kind, keys):
+        """Seconds since each known key was last loaded successfully."""
+        now = time.time()
+        with self._lock:
+            return {key: now - self._entries[(kind, key)].fetched_at for key in keys if (kind, key) in self._entries}
+
+    def refresh_errors(self, kind, keys):
+        """The error of each known key whose latest refresh failed; its last good value is still served."""
+        with self._lock:
+            entries = ((key, self._entries.get((kind, key))) for key in keys)
+            return {key: entry.error for key, entry in entries if entry is not None and entry.error is not None}
+
+    def poll(self):
+        """Refreshes tracked keys that are close to expiring and forgets keys that have gone idle."""
+        now = time.time()
+        due = defaultdict(list)
+        with self._lock:
+            for (kind, key), entry in list(self._entries.items()):
+                if now - entry.last_requested > self.idle_timeout:
+                    del self._entries[(kind, key)]
+                elif (now - entry.fetched_at >= self._kinds[kind].ttl * REFRESH_AHEAD and now >= entry.retry_at
+                        and (kind, key) not in self._inflight):
+                    due[kind].append(key)
+        for kind, keys in due.items():
+            self.refresh(kind, keys)
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            self.poll()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="refresher-poll").start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._pool.shutdown(wait=False)
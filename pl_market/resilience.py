@@ -0,0 +1,176 @@
+"""
+Bounded-latency upstream calls: per-call deadlines, jittered exponential
+backoff, a circuit breaker per upstream, and hedged duplicate requests when
+the first attempt runs past the stage's usual p95.
+"""
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import requests
+
+from .tracing import span, tracer
+
+RETRY_ATTEMPTS = 3
+BACKOFF_BASE = 0.25  # seconds; attempt n sleeps uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**n))
+BACKOFF_MAX = 2.0
+HEDGE_AFTER = 1.0  # seconds before hedging when a stage has no latency history yet
+HEDGE_MIN = 0.05
+HEDGE_BUDGET = 4  # duplicates in flight at once, process-wide; past that, calls just wait for their first attempt
+BREAKER_FAILURES = 5  # consecutive upstream failures that open a breaker
+BREAKER_RESET = 30  # seconds an open breaker fails fast before letting a probe through
+
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_BUDGET, thread_name_prefix="hedge")
+_hedge_slots = threading.BoundedSemaphore(HEDGE_BUDGET)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    pass
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+class Deadline:
+    """A point in time shared by every call of one fetch."""
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failures` consecutive upstream errors, then lets one
+    probe through every `reset` seconds until a call succeeds again.
+    """
+    def __init__(self, name, failures=BREAKER_FAILURES, reset=BREAKER_RESET):
+        self.name = name
+        self.failures = failures
+        self.reset = reset
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive, self._opened_at, self._probing = 0, None, False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or self._consecutive >= self.failures:
+                self._opened_at, self._probing = time.monotonic(), False
+
+    def release(self):
+        """Gives up a probe that ended without an upstream answer, so the next call can probe again."""
+        with self._lock:
+            self._probing = False
+
+
+def is_retryable(e):
+    """Timeouts, connection errors, 429 and 5xx are worth another try; other errors aren't."""
+    status = getattr(getattr(e, "response", None), "status_code", None) or getattr(e, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, FutureTimeout))
+
+def hedge_delay(stage):
+    """Hedge once a call has run past the stage's p95 so far."""
+    p95 = tracer.quantile(stage, 0.95)
+    return max(HEDGE_MIN, p95) if p95 is not None else HEDGE_AFTER
+
+def _start(fn, *args):
+    """Runs fn on a thread of its own, so the first attempt never queues behind other calls."""
+    future = Future()
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    threading.Thread(target=run, daemon=True, name="upstream").start()
+    return future
+
+def _hedged(fn, timeout, hedge_after):
+    expires_at = time.monotonic() + timeout
+    first = _start(fn, timeout)
+    try:
+        return first.result(timeout=hedge_after)
+    except FutureTimeout:
+        pass
+    try:
+        if not _hedge_slots.acquire(blocking=False):
+            # Every hedge slot is busy; another duplicate would only add to the load that's slowing things down
+            return first.result(timeout=expires_at - time.monotonic())
+        with span("hedge"):
+            second = _hedge_pool.submit(fn, max(HEDGE_MIN, expires_at - time.monotonic()))
+            second.add_done_callback(lambda _: _hedge_slots.release())
+            error = None
+            for future in as_completed([first, second], timeout=max(0.0, expires_at - time.monotonic())):
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            raise error
+    except FutureTimeout:
+        raise requests.exceptions.Timeout(f"no response within {timeout:.1f}s") from None
+
+def call_upstream(fn, breaker=None, deadline=None, timeout=10, attempts=RETRY_ATTEMPTS, hedge_after=None):
+    """
+    Calls fn(timeout) with retries and jittered exponential backoff, never past
+    the deadline. With hedge_after, a duplicate call is sent if the first one
+    hasn't answered by then, and whichever succeeds first wins.
+    Raises:
+        CircuitOpenError: the breaker is open, nothing was sent.
+        DeadlineExceeded: the deadline ran out before an answer.
+    """
+    for attempt in range(attempts):
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} circuit open after repeated failures")
+        call_timeout = timeout if deadline is None else min(timeout, deadline.remaining())
+        if call_timeout <= 0:
+            if breaker is not None:
+                breaker.release()
+            raise DeadlineExceeded(f"deadline of {deadline.seconds}s exceeded")
+        try:
+            result = _hedged(fn, call_timeout, hedge_after) if hedge_after and hedge_after < call_timeout else fn(call_timeout)
+        except Exception as e:
+            retryable = is_retryable(e)
+            if breaker is not None:
+                # A 4xx is still an answer: the upstream is up, the request was bad
+                breaker.record_failure() if retryable else breaker.record_success()
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            if not retryable or attempt == attempts - 1 or (deadline is not None and delay >= deadline.remaining()):
+                raise
+            time.sleep(delay)
+            continue
+        except BaseException:
+            if breaker is not None:
+                breaker.release()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return result
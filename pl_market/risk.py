@@ -0,0 +1,74 @@
+"""Risk bands for share prices."""
+import numpy as np
+
+risk_mapping = {(97, 99): "Very Low Risk",
+    (91, 96): "Low Risk",
+    (87, 90): "Moderately Low Risk",
+    (79, 86): "Moderate Risk",
+    (71, 79): "Moderately High Risk",
+    (61, 70): "High Risk",
+    (50, 60): "Very High Risk",
+    (40, 49): "Extremely High Risk",
+    (20, 30): "Speculative Risk",
+    (0, 19): "Extreme Risk",}
+
+
+# You can adjust these colors to fit your theme or use a gradient
+risk_colors = {"Very Low Risk": "#00f27d",  # Green
+    "Low Risk": "#6ce191",
+    "Moderately Low Risk": "#a6e17d",
+    "Moderate Risk": "#e1df6c",
+    "Moderately High Risk": "#f4c242",
+    "High Risk": "#f79f3d",
+    "Very High Risk": "#f76d6d",
+    "Extremely High Risk": "#e1457b",
+    "Speculative Risk": "#ba1f64",
+    "Extreme Risk": "#a3004f",}  # Deep Red
+INVALID_RISK_COLOR = "#a3004f"
+
+# Bin-edge index over risk_mapping, sorted by lower bound. A percentage belongs to
+# the band with the highest lower bound at or below it, which defines the edge cases:
+#   - overlaps go to the higher band (79 is "Moderate Risk", not "Moderately High Risk")
+#   - gaps go to the band below (31-39 is "Speculative Risk", 78.5 is "Moderately High Risk")
+#   - 100 is "Very Low Risk"; anything outside 0-100 (or NaN) is "Invalid Price"
+_risk_bands = sorted(risk_mapping.items(), key=lambda item: item[0][0])
+RISK_BAND_EDGES = np.array([low for (low, _), _ in _risk_bands], dtype=float)
+RISK_BAND_LABELS = np.array([label for _, label in _risk_bands], dtype=object)
+RISK_BAND_RANGES = np.array([f"{low}-{high}%" for (low, high), _ in _risk_bands], dtype=object)
+RISK_BAND_TOOLTIPS = np.array([f"{label}: {low}%-{high}%" for (low, high), label in _risk_bands], dtype=object)
+RISK_BAND_COLORS = np.array([risk_colors[label] for _, label in _risk_bands], dtype=object)
+
+def classify_risk(percentages):
+    """
+    Classifies probability percentages (0-100) into risk bands in one array operation.
+    Args:
+        percentages (array-like): Probabilities in percent.
+    Returns:
+        dict: 'label', 'range', 'tooltip' and 'color' arrays, one entry per input.
+              Invalid inputs get ("Invalid Price", "N/A", "", INVALID_RISK_COLOR).
+    """
+    percentages = np.asarray(percentages, dtype=float)
+    valid = (percentages >= 0) & (percentages <= 100)
+    band = np.clip(np.searchsorted(RISK_BAND_EDGES, percentages, side='right') - 1, 0, len(RISK_BAND_EDGES) - 1)
+    return {'label': np.where(valid, RISK_BAND_LABELS[band], "Invalid Price"),
+        'range': np.where(valid, RISK_BAND_RANGES[band], "N/A"),
+        'tooltip': np.where(valid, RISK_BAND_TOOLTIPS[band], ""),
+        'color': np.where(valid, RISK_BAND_COLORS[band], INVALID_RISK_COLOR)}
+
+def classify_risk_from_prices(prices):
+    """Same as classify_risk for share prices (0.00 to 1.00), truncated to whole percent."""
+    # Round away float noise first so 0.57 lands on 57, not 56.999...
+    return classify_risk(np.floor(np.round(np.asarray(prices, dtype=float) * 100, 9)))
+
+def get_risk_info_from_price(price):
+    """
+    Categorizes the risk and returns both the risk label and probability range
+    based on the price of a share.
+    Args:
+        price (float): The price of a share (0.00 to 1.00).
+    Returns:
+        tuple: (risk_label, probability_range_str)
+               Returns ("Invalid Price", "N/A") for invalid prices.
+    """
+    risk = classify_risk_from_prices([price])
+    return risk['label'][0], risk['range'][0]
@@ -0,0 +1,93 @@
+"""
+Monte Carlo resolution risk: every open market resolves Yes with probability
+curPrice, and the portfolio's payout is tallied over many scenarios at once.
+"""
+import numpy as np
+import pandas as pd
+
+SIMULATION_SCENARIOS = 200_000
+SIMULATION_BATCH = 20_000  # scenarios per matrix, bounds memory to batch x markets
+PAYOUT_PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+
+
+def resolution_inputs(positions_df):
+    """
+    Per-position arrays for the simulator from holdings columns.
+    Returns:
+        tuple: (market_index, event_index, yes_probability per market,
+                is_yes per position, sizes).
+    """
+    # Both sides of one market share a draw; conditionId identifies the market
+    market_key = positions_df['conditionId'] if 'conditionId' in positions_df else positions_df['asset']
+    market_index, markets = pd.factorize(market_key)
+    is_yes = (positions_df['outcomeIndex'] if 'outcomeIndex' in positions_df else pd.Series(0, index=positions_df.index)).to_numpy() == 0
+
+    # Yes probability per market, averaged over the sides held (No at q means Yes at 1 - q)
+    price = positions_df['curPrice'].to_numpy(dtype=float)
+    yes_price = np.where(is_yes, price, 1 - price)
+    yes_probability = np.clip(np.bincount(market_index, yes_price) / np.bincount(market_index), 0, 1)
+
+    events = positions_df['eventSlug'] if 'eventSlug' in positions_df else market_key
+    # one event per market: the event of its first position
+    first_rows = pd.Series(np.arange(len(market_index))).groupby(market_index).first().to_numpy()
+    event_index = pd.factorize(events.to_numpy()[first_rows])[0]
+    return market_index, event_index, yes_probability, is_yes, positions_df['size'].to_numpy(dtype=float)
+
+def simulate_resolutions(positions_df, n_scenarios=SIMULATION_SCENARIOS, correlation=0.0, batch_size=SIMULATION_BATCH, seed=None):
+    """
+    Draws market resolutions and returns the portfolio payout distribution.
+    Markets in the same eventSlug are tied together by a common shock: with
+    probability `correlation` a market reuses its event's uniform draw instead
+    of its own, so 0 is independent and 1 moves each event as a block.
+    Args:
+        positions_df (pd.DataFrame): Open positions with size, curPrice,
+            initialValue, currentValue and ideally conditionId, outcomeIndex, eventSlug.
+    Returns:
+        dict: payouts (one per scenario), expected_payout, expected_pnl,
+              prob_loss (payout below cost basis), var_95 / var_99 (loss
+              against current value at those confidence levels) and
+              percentiles of the payout.
+    """
+    if positions_df.empty:
+        return {}
+    market_index, event_index, yes_probability, is_yes, sizes = resolution_inputs(positions_df)
+    n_markets, n_events = len(yes_probability), event_index.max() + 1
+    yes_probability = yes_probability.astype(np.float32)
+    # Shares per market on each side: a scenario pays the No shares plus, where
+    # the market resolves Yes, the difference between Yes and No shares
+    yes_shares = np.bincount(market_index, sizes * is_yes, minlength=n_markets)
+    no_shares = np.bincount(market_index, sizes * ~is_yes, minlength=n_markets)
+    swing = (yes_shares - no_shares).astype(np.float32)
+    own_threshold = np.float32(correlation) + yes_probability * np.float32(1 - correlation)
+    rng = np.random.default_rng(seed)
+
+    payouts = np.empty(n_scenarios)
+    draws = np.empty((min(batch_size, n_scenarios), n_markets), dtype=np.float32)  # reused by every batch
+    for start in range(0, n_scenarios, batch_size):
+        n = min(batch_size, n_scenarios - start)
+        if correlation >= 1:
+            resolved_yes = rng.random((n, n_events), dtype=np.float32)[:, event_index] < yes_probability
+        elif correlation > 0:
+            # A draw below `correlation` defers to the event's shared draw; above it, the
+            # draw is still uniform on what's left, so compare it to the rescaled probability.
+            # own_threshold >= correlation, so every deferring draw passes the first test and
+            # the second one applies the shared draw: plain boolean ops, no np.where
+            rng.random(dtype=np.float32, out=draws[:n])
+            resolved_yes = draws[:n] < own_threshold
+            keep = draws[:n] >= correlation
+            keep |= rng.random((n, n_events), dtype=np.float32)[:, event_index] < yes_probability
+            resolved_yes &= keep
+        else:
+            resolved_yes = rng.random((n, n_markets), dtype=np.float32) < yes_probability
+        payouts[start:start + n] = no_shares.sum() + resolved_yes.astype(np.float32) @ swing
+
+    cost = float(positions_df['initialValue'].sum())
+    current_value = float(positions_df['currentValue'].sum())
+    percentiles = dict(zip(PAYOUT_PERCENTILES, np.percentile(payouts, PAYOUT_PERCENTILES).tolist()))
+    return {"payouts": payouts,
+        "expected_payout": float(payouts.mean()),
+        "expected_pnl": float(payouts.mean()) - cost,
+        "prob_loss": float((payouts < cost).mean()),
+        "var_95": current_value - percentiles[5],
+        "var_99": current_value - percentiles[1],
+        "percentiles": percentiles}
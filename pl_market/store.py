@@ -0,0 +1,110 @@
+"""
+On-disk snapshots of holdings and order books, so restarts and extra workers
+start warm. One SQLite file (WAL mode) can be shared by every process on a host.
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from .books import _unpack_order_book
+
+DEFAULT_STORE_PATH = os.environ.get("PL_MARKET_STORE", os.path.join(".cache", "pl_market_snapshots.sqlite"))
+SNAPSHOT_MAX_AGE = 24 * 3600  # seconds before a snapshot is pruned
+SNAPSHOT_MAX_ROWS = 20000  # per table, newest kept
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS holdings (
+    wallet TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    positions TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS holdings_fetched_at ON holdings (fetched_at);
+CREATE TABLE IF NOT EXISTS books (
+    asset_id TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    market TEXT,
+    timestamp TEXT,
+    hash TEXT,
+    n_bids INTEGER NOT NULL,
+    levels BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_fetched_at ON books (fetched_at);
+"""
+
+
+class SnapshotStore:
+    """
+    Latest holdings per wallet and latest book per asset, each stamped with the
+    wall-clock time it was fetched. Reads return (fetched_at, value) so callers
+    decide what is fresh enough. Old and excess rows are pruned on every write.
+    """
+    def __init__(self, path=DEFAULT_STORE_PATH, max_age=SNAPSHOT_MAX_AGE, max_rows=SNAPSHOT_MAX_ROWS):
+        self.path = path
+        self.max_age = max_age
+        self.max_rows = max_rows
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        self.prune()
+
+    @contextmanager
+    def _connect(self):
+        # A connection per call: sqlite3 connections can't be shared across threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load_holdings(self, wallets):
+        """Returns {wallet: (fetched_at, positions)} for the wallets the store has."""
+        wallets = list(wallets)
+        if not wallets:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT wallet, fetched_at, positions FROM holdings WHERE wallet IN ({','.join('?' * len(wallets))})",
+                wallets).fetchall()
+        return {wallet: (fetched_at, json.loads(positions)) for wallet, fetched_at, positions in rows}
+
+    def save_holdings(self, positions_by_wallet, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO holdings VALUES (?, ?, ?)",
+                [(wallet, fetched_at, json.dumps(positions)) for wallet, positions in positions_by_wallet.items()])
+        self.prune()
+
+    def load_books(self, asset_ids):
+        """Returns {asset_id: (fetched_at, OrderBook)} for the assets the store has."""
+        asset_ids = list(asset_ids)
+        books = {}
+        with self._connect() as conn:
+            for start in range(0, len(asset_ids), 500):  # stay under SQLite's bound-parameter limit
+                chunk = asset_ids[start:start + 500]
+                rows = conn.execute("SELECT asset_id, fetched_at, market, timestamp, hash, n_bids, levels FROM books "
+                    f"WHERE asset_id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                for asset_id, fetched_at, market, timestamp, hash, n_bids, levels in rows:
+                    books[asset_id] = (fetched_at, _unpack_order_book(asset_id, market, timestamp, hash, n_bids, levels))
+        return books
+
+    def save_books(self, books, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(asset_id, fetched_at, book.market, book.timestamp, book.hash, len(book.bid_price), book._levels())
+                    for asset_id, book in books.items()])
+        self.prune()
+
+    def prune(self, max_age=None, max_rows=None):
+        """Deletes snapshots older than max_age seconds, then all but the newest max_rows per table."""
+        cutoff = time.time() - (max_age or self.max_age)
+        max_rows = max_rows or self.max_rows
+        with self._connect() as conn:
+            for table in ("holdings", "books"):
+                conn.execute(f"DELETE FROM {table} WHERE fetched_at < ?", (cutoff,))
+                conn.execute(f"DELETE FROM {table} WHERE rowid IN "
+                    f"(SELECT rowid FROM {table} ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)", (max_rows,))
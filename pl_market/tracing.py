@@ -0,0 +1,156 @@
+"""
+Lightweight tracing for the pipeline: spans around each stage record their
+duration, item counts, cache hits/misses and upstream status, aggregated into
+histograms that render as Prometheus text for a scrape endpoint or textfile.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RECENT_SPANS = 500  # finished spans kept for the debug panel
+METRIC_PREFIX = "pl_market"
+
+
+def _sample(value):
+    """Exact sample text: :g would round large counts (3703701 -> 3.7037e+06) and break rate()."""
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class Span:
+    """One timed stage. Numeric attributes are added up per stage; `status` is counted per value."""
+    __slots__ = ("name", "attrs", "start", "duration")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+
+class Tracer:
+    def __init__(self, buckets=LATENCY_BUCKETS, recent=RECENT_SPANS):
+        self.buckets = np.asarray(buckets, dtype=float)
+        self._histograms = {}  # stage -> [bucket counts..., +Inf count], sum
+        self._counters = {}  # (stage, item) -> total
+        self._statuses = {}  # (stage, status) -> count
+        self.recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span = Span(name, attrs)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs.setdefault("status", getattr(e, "status_code", None) or "error")
+            span.attrs.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            self.record(span, time.perf_counter() - started)
+
+    def record(self, span, duration):
+        """Adds a finished span (or a Span built by hand, e.g. for a whole page run) to the aggregates."""
+        span.duration = duration
+        with self._lock:
+            counts, total = self._histograms.get(span.name, (np.zeros(len(self.buckets) + 1, dtype=np.int64), 0.0))
+            counts[np.searchsorted(self.buckets, duration, side='left')] += 1
+            self._histograms[span.name] = (counts, total + duration)
+            for key, value in span.attrs.items():
+                if key == "status":
+                    self._statuses[(span.name, str(value))] = self._statuses.get((span.name, str(value)), 0) + 1
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self._counters[(span.name, key)] = self._counters.get((span.name, key), 0) + value
+            self.recent.append(span)
+
+    def quantile(self, name, q):
+        """Estimates a latency quantile from the stage's histogram, interpolating within the bucket like histogram_quantile."""
+        with self._lock:
+            if name not in self._histograms:
+                return None
+            counts = self._histograms[name][0].copy()
+        cumulative = np.cumsum(counts)
+        rank = q * cumulative[-1]
+        i = int(np.searchsorted(cumulative, rank, side='left'))
+        if i >= len(self.buckets):
+            return float(self.buckets[-1])
+        lower = self.buckets[i - 1] if i > 0 else 0.0
+        below = cumulative[i - 1] if i > 0 else 0
+        return float(lower + (self.buckets[i] - lower) * (rank - below) / max(counts[i], 1))
+
+    def summary(self):
+        """Per-stage count, mean, p50 and p95 seconds, for the debug panel."""
+        with self._lock:
+            stages = {name: (int(counts.sum()), total) for name, (counts, total) in self._histograms.items()}
+        return {name: {"count": count, "mean": total / count if count else 0.0,
+            "p50": self.quantile(name, 0.5), "p95": self.quantile(name, 0.95)} for name, (count, total) in sorted(stages.items())}
+
+    def prometheus_text(self):
+        """The aggregates in the Prometheus text exposition format."""
+        lines = [f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds histogram"]
+        with self._lock:
+            histograms = {name: (counts.copy(), total) for name, (counts, total) in self._histograms.items()}
+            counters, statuses = dict(self._counters), dict(self._statuses)
+        for name, (counts, total) in sorted(histograms.items()):
+            cumulative = np.cumsum(counts)
+            for bound, count in zip(self.buckets, cumulative):
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{name}",le="{bound:g}"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {cumulative[-1]}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{name}"}} {cumulative[-1]}')
+
+        lines += [f"# HELP {METRIC_PREFIX}_stage_items_total Items handled per stage (rows, assets, cache hits/misses, ...).",
+            f"# TYPE {METRIC_PREFIX}_stage_items_total counter"]
+        lines += [f'{METRIC_PREFIX}_stage_items_total{{stage="{name}",item="{item}"}} {_sample(value)}'
+            for (name, item), value in sorted(counters.items())]
+        lines += [f"# HELP {METRIC_PREFIX}_stage_status_total Finished spans per stage and status (HTTP code, ok, error).",
+            f"# TYPE {METRIC_PREFIX}_stage_status_total counter"]
+        lines += [f'{METRIC_PREFIX}_stage_status_total{{stage="{name}",status="{status}"}} {count}'
+            for (name, status), count in sorted(statuses.items())]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes the metrics atomically, e.g. for node_exporter's textfile collector."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def serve_prometheus(self, port, host="0.0.0.0"):
+        """Serves the metrics at http://host:port/metrics from a daemon thread."""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                body = tracer.prometheus_text().encode() if self.path.split("?")[0] == "/metrics" else b""
+                self.send_response(200 if body else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+        return server
+
+
+# Process-wide tracer the pipeline modules report to
+tracer = Tracer()
+
+def span(name, **attrs):
+    return tracer.span(name, **attrs)
@@ -1,11 +1,24 @@
-import requests
 import pandas as pd
-import json
-from py_clob_client.client import ClobClient, ApiCreds, TradeParams, BookParams
 import streamlit as st
 import plotly.express as px
 from typing import List
-import re
+import html
+import numpy as np
+import os
+import time
+from functools import partial
+
+from pl_market import books, holdings, liquidation, simulate
+from pl_market.books import OrderBook
+from pl_market.history import HistoryStore, bucket_for
+from pl_market.live import LivePortfolio
+from pl_market.portfolio import build_view_model, open_positions, portfolio_totals
+from pl_market.risk import classify_risk, risk_mapping
+from pl_market.refresh import Refresher
+from pl_market.store import SnapshotStore
+from pl_market.tracing import Span, span, tracer
+
+page_started = time.perf_counter()
 
 st.set_page_config(layout="wide", page_title="Polymarket Dashboard", page_icon="📊")
 
@@ -60,423 +73,442 @@ polymarket_url = f"https://polymarket.com/profile/{default_wallet[0]}" # adjuste
 st.markdown(f"""<label for="wallet">Enter Polymarket Wallet(s) (comma-separated) <a href="{polymarket_url}" target="_blank" style="color: #00c0f2; text-decoration: none;">Address</a>:</label>""", unsafe_allow_html=True)
 wallet_input = st.text_input("", value=",".join(default_wallet), key="wallet_input") # changed default value
 
+live_mode = st.toggle("⚡ Live order books", value=False,
+    help="Keep order books current from the CLOB market feed instead of refetching them every 60 seconds.")
+
+shared_books = st.toggle("🤝 Share books across wallets", value=False,
+    help="Wallets holding the same market sell into one book together instead of each assuming the whole book.")
+allocation = None
+if shared_books:
+    allocation = st.radio("Allocate fills", ["pro_rata", "priority"], horizontal=True, key="allocation",
+        format_func={"pro_rata": "Pro rata", "priority": "Wallet order"}.get)
+
 # Update session state with the list of wallet addresses
 if wallet_input:
     st.session_state.wallet_addresses = [addr.strip() for addr in wallet_input.split(",")]
 
 
-@st.cache_data(ttl=60, show_spinner="Fetching Holdings...")
-def fetch_holdings(wallet_addresses: List[str]):
-    all_holdings = []
-    for address in wallet_addresses:
-        url = 'https://data-api.polymarket.com/positions?user=' + address
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            df = pd.DataFrame(data)
-            if not df.empty:
-                df['risk'] = df['initialValue'].round(2)
-                df['avgPrice'] = df['avgPrice'].round(2)
-                df['curPrice'] = df['curPrice'].round(2)
-                df['reward'] = df['size'] - df['initialValue'] + df['realizedPnl']
-                df['%_return'] = ((df['reward'] / df['initialValue']) * 100).round(2)
-                df['market_link'] = "https://polymarket.com/event/" + df['eventSlug']
-                all_holdings.append(df)
-        except requests.exceptions.RequestException as e:
-            st.error(f"Error fetching holdings for {address}: {e}")
-            return pd.DataFrame()  # Return empty DataFrame on error
-
-    if all_holdings:
-        combined_df = pd.concat(all_holdings, ignore_index=True)
-        return combined_df
-    else:
-        return pd.DataFrame()
+@st.cache_resource
+def get_http_session():
+    return holdings.make_http_session()
 
-@st.cache_data(ttl=60, show_spinner="Fetching Order Books...")
-def fetch_order_books(asset_ids):
-    if not asset_ids:
-        return {}
-    host: str = "https://clob.polymarket.com/"
-    key: str = ""
-    chain_id: int = 137
-    api_keys = st.secrets["username"]
-    client = ClobClient(host, key=api_keys, chain_id=chain_id)
-    order_books = client.get_order_books([BookParams(token_id=token_id) for token_id in asset_ids])
-    order_book_asset = {}
-
-    for order_book in order_books:
-        df = json.loads(order_book.json)
-
-        if len(df['bids']) == 0:
-            bids_df = pd.DataFrame({'price': [0.0], 'size': [0.0]})
-        else:
-            bids_df = pd.DataFrame(df['bids']).sort_values(by='price', ascending=True)
-            bids_df['price'] = pd.to_numeric(bids_df['price'])
-
-        if len(df['asks']) == 0:
-            asks_df = pd.DataFrame({'price': [0.0], 'size': [0.0]})
-        else:
-            asks_df = pd.DataFrame(df['asks']).sort_values(by='price', ascending=True)
-            asks_df['price'] = pd.to_numeric(asks_df['price'])
-
-        bids_df['type'] = 'bid'
-        asks_df['type'] = 'ask'
-
-        bids_df['total'] = bids_df['price'] * bids_df['size'].astype(float)
-        asks_df['total'] = asks_df['price'] * asks_df['size'].astype(float)
-
-        bids_df['dollar_size'] = bids_df['total'].cumsum()
-        asks_df['dollar_size'] = asks_df['total'].cumsum()
-
-        asks_df['asset_id'] = df['asset_id']
-        asks_df['hash'] = df['asset_id']
-        asks_df['market'] = df['asset_id']
-        asks_df['timestamp'] = df['asset_id']
-
-        bids_df['asset_id'] = df['asset_id']
-        bids_df['hash'] = df['asset_id']
-        bids_df['market'] = df['asset_id']
-        bids_df['timestamp'] = df['asset_id']
-
-        if len(bids_df) == 1 and len(asks_df) == 1:
-            combined_df = pd.concat([bids_df, asks_df])
-        elif len(bids_df) == 1:
-            combined_df = pd.concat([bids_df, asks_df], ignore_index=True).sort_values(by='price', ascending=False)
-        elif len(asks_df) == 1:
-            combined_df = pd.concat([bids_df, asks_df], ignore_index=True).sort_values(by='price', ascending=False)
-        else:
-            combined_df = pd.concat([bids_df, asks_df], ignore_index=True).sort_values(by='price', ascending=False)
-
-        if 'total' in combined_df.columns:
-            del combined_df['total']
-
-        combined_df['price'] = combined_df['price'].astype(float)
-        combined_df['size'] = combined_df['size'].astype(float)
-
-        order_book_asset[df['asset_id']] = combined_df
-
-    return order_book_asset
-
-def get_partial_sell_price(position_size, order_book, percent=1.0):
-    target_shares = position_size * percent
-    remaining_shares = target_shares
-    total_sell_value = 0
-    final_sell_price = 0
-
-    for idx, row in order_book.iterrows():
-        if remaining_shares > 0:
-            shares_to_sell = min(remaining_shares, row['size'])
-            total_sell_value += shares_to_sell * row['price']
-            final_sell_price = row['price']
-            remaining_shares -= shares_to_sell
-        if remaining_shares <= 0:
-            break
-
-    return final_sell_price, total_sell_value
-
-@st.cache_data(show_spinner="Calculating Liquidation Prices...")
-def add_partial_sell_prices(stock_info_df, order_books_dict, percent_list):
-    if stock_info_df.empty:
-        return stock_info_df
-    stock_info_df['asset'] = stock_info_df['asset'].astype(str)
-
-    for percent in percent_list:
-        sell_prices = []
-        total_values = []
-        mark_pnls = []
-
-        for _, stock in stock_info_df.iterrows():
-            stock_name = stock['asset']
-            order_book = order_books_dict.get(stock_name)
-            if order_book is None:
-                sell_prices.append(0)
-                total_values.append(0)
-                mark_pnls.append(0)
-                continue
-
-            order_book = order_book[order_book['type'] == 'bid'].sort_values(by='price', ascending=False)
-            sell_price, total_sell_value = get_partial_sell_price(stock['size'], order_book, percent)
-            sell_prices.append(sell_price)
-            total_values.append(total_sell_value)
-
-            partial_risk = stock['risk'] * percent
-            mark_pnls.append(total_sell_value - partial_risk)
-
-        pct_label = int(percent * 100)
-        stock_info_df[f'sell_price_{pct_label}%'] = sell_prices
-        stock_info_df[f'total_sell_value_{pct_label}%'] = total_values
-        stock_info_df[f'market_pnl_{pct_label}%'] = mark_pnls
-
-    if not stock_info_df['size'].fillna(0).astype(float).eq(0).all():
-        stock_info_df['sell_price_100%'] = (stock_info_df['total_sell_value_100%'] / stock_info_df['size']).round(2)
-    else:
-        stock_info_df['sell_price_100%'] = 0.0
-    return stock_info_df
+@st.cache_resource
+def get_snapshot_store():
+    return SnapshotStore()
 
-def extract_date_from_title(title: str) -> str:
+@st.cache_resource
+def start_metrics_server():
+    # Prometheus scrape endpoint, only when PL_MARKET_METRICS_PORT is set
+    port = os.environ.get("PL_MARKET_METRICS_PORT")
+    return tracer.serve_prometheus(int(port)) if port else None
+
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
+
+@st.cache_resource
+def get_clob_client():
+    api_keys = st.secrets["username"]
+    return books.make_clob_client(api_keys)
+
+@st.cache_resource
+def get_refresher():
+    # Serves last good holdings/books instantly and re-polls them in the background before they expire
+    session, store = get_http_session(), get_snapshot_store()
+    refresher = Refresher()
+    refresher.register("holdings", partial(holdings.load_positions, session=session, store=store),
+        ttl=holdings.HOLDINGS_TTL, seed=store.load_holdings)
+    refresher.register("books", partial(books.load_order_books, get_clob_client(), store=store),
+        ttl=books.ORDER_BOOK_TTL, seed=store.load_books)
+    return refresher.start()
+
+FETCH_WAIT = 8  # seconds a page waits on each upstream before rendering with what it has
+STALE_AFTER = 2  # TTLs past which a served value counts as stale
+
+def stale_values(refresher, kind, keys, ttl):
     """
-    Extracts a date from the title string, looking for "before", "after", or "by".
-    Returns a string in YYYY-MM-DD format if found, otherwise "".
+    {key: (age, error)} for served values older than STALE_AFTER TTLs, e.g. an
+    old snapshot seeded on a warm start. error is why the latest refresh
+    failed, or None while the first refresh is still on its way.
     """
-    month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-    date_patterns = [
-        r"(before|after|by)\s*(\w+)\s*(\d{1,2})",  # e.g., "before May 31"
-        r"(\w+)\s*(\d{1,2})\s*(before|after|by)",  # e.g., "May 31 before"
-        r"(\d{4})",                                 # e.g., "2025"
-    ]
-
-    for pattern in date_patterns:
-        match = re.search(pattern, title, re.IGNORECASE)
-        if match:
-            if pattern == r"(\d{4})":
-                year = int(match.group(1))
-                return f"{year}-12-31"  # Default to Dec 31 if only year is found
-
-            else:
-                month_str = match.group(2) if pattern.find("before|after|by") else match.group(1)
-                day = int(match.group(3)) if pattern.find("before|after|by") else int(match.group(2))
-                try:
-                    month = next(i for i, m in enumerate(month_names, 1) if m.lower() == month_str[:3].lower())
-                except StopIteration:
-                    return ""  # Return empty string if month is invalid
-                year = 2025 # Hardcoded year, adjust if needed
-                return f"{year}-{month:02d}-{day:02d}"
-
-    return ""  # Return empty string if no date found
-
-risk_mapping = {(97, 99): "Very Low Risk",
-    (91, 96): "Low Risk",
-    (87, 90): "Moderately Low Risk",
-    (79, 86): "Moderate Risk",
-    (71, 79): "Moderately High Risk",
-    (61, 70): "High Risk",
-    (50, 60): "Very High Risk",
-    (40, 49): "Extremely High Risk",
-    (20, 30): "Speculative Risk",
-    (0, 19): "Extreme Risk",}
+    failed = refresher.refresh_errors(kind, keys)
+    return {key: (age, failed.get(key)) for key, age in refresher.ages(kind, keys).items() if age > STALE_AFTER * ttl}
+
+def fetch_holdings(wallet_addresses: List[str]):
+    """Returns (holdings_df, errors, stale), stale as in stale_values."""
+    addresses = list(dict.fromkeys(addr for addr in wallet_addresses if addr))
+    refresher = get_refresher()
+    positions, errors = refresher.get_many("holdings", addresses, timeout=FETCH_WAIT)
+    stale = stale_values(refresher, "holdings", positions, holdings.HOLDINGS_TTL)
+    return holdings.holdings_frame(positions, addresses), errors, stale
+
+def fetch_order_books(asset_ids):
+    """Returns (books, errors, stale) like fetch_holdings, per asset id."""
+    refresher = get_refresher()
+    order_books, errors = refresher.get_many("books", list(dict.fromkeys(asset_ids)), timeout=FETCH_WAIT)
+    return order_books, errors, stale_values(refresher, "books", order_books, books.ORDER_BOOK_TTL)
+
+@st.cache_data(show_spinner="Calculating Liquidation Prices...", hash_funcs={OrderBook: OrderBook.cache_key})
+def add_partial_sell_prices(stock_info_df, order_books_dict, percent_list, allocation=None):
+    return liquidation.add_partial_sell_prices(stock_info_df, order_books_dict, percent_list, allocation)
+
+LIVE_REFRESH = 5  # seconds between redraws of the metrics and views in live mode
+
+# One feed per session: replaced (and closed) when the positions change, closed when the session ends
+@st.cache_resource(scope="session", max_entries=1, on_release=LivePortfolio.close, show_spinner=False)
+def get_live_portfolio(asset_ids, sizes, percent_list, allocation, _positions_df, _order_books_dict):
+    return LivePortfolio(_positions_df, _order_books_dict, percent_list, allocation).start()
 
 # Create a DataFrame to display
 risk_df = pd.DataFrame([{"Risk Category": v, "Score Range": f"{k[0]}%-{k[1]}%"}
     for k, v in risk_mapping.items()])
 
-def get_risk_info_from_price(price):
+
+ROWS_PER_PAGE_OPTIONS = [25, 50, 100, 250]
+
+def build_table_html(df):
     """
-    Categorizes the risk and returns both the risk label and probability range
-    based on the price of a share.
-    Args:
-        price (float): The price of a share (0.00 to 1.00).
-    Returns:
-        tuple: (risk_label, probability_range_str)
-               Returns ("Invalid Price", "N/A") for invalid prices.
+    Builds the markup for every row of the positions table in one pass over
+    whole columns, so the page sends a single element however many positions
+    there are. Columns, colours, tooltips and links match the dashboard rows.
     """
-    if not 0.00 <= price <= 1.00:
-        return "Invalid Price", "N/A"
-    probability_percentage = int(price * 100)
-    for (lower_bound, upper_bound), label in risk_mapping.items():
-        if lower_bound <= probability_percentage <= upper_bound:
-            return label, f"{lower_bound}-{upper_bound}%"
-    return "Invalid Probability", "N/A"  # Should not reach here if price is valid
-
-def risk_color_scale(risk_value):
-    # You can adjust these colors to fit your theme or use a gradient
-    if 97 <= risk_value <= 99:
-        return "#00f27d"  # Very Low Risk – Green
-    elif 91 <= risk_value <= 96:
-        return "#6ce191"
-    elif 87 <= risk_value <= 90:
-        return "#a6e17d"
-    elif 79 <= risk_value <= 86:
-        return "#e1df6c"
-    elif 71 <= risk_value <= 78:
-        return "#f4c242"
-    elif 61 <= risk_value <= 70:
-        return "#f79f3d"
-    elif 50 <= risk_value <= 60:
-        return "#f76d6d"
-    elif 40 <= risk_value <= 49:
-        return "#e1457b"
-    elif 20 <= risk_value <= 39:
-        return "#ba1f64"
-    else:
-        return "#a3004f"  # Extreme Risk – Deep Red
+    if df.empty:
+        return ""
+
+    def fmt(column, spec):
+        return df[column].map(spec.format)
+
+    def signed_color(column):
+        return pd.Series(np.where(df[column] > 0, "#00f27d", "#f76d6d"), index=df.index)
+
+    cell = '<div style="flex: 1; text-align: center; min-width: 100px;">'
+    risk = classify_risk(df['avg'])
+    tooltip = pd.Series(risk['tooltip'], index=df.index)
+    pnl_text = pd.Series(np.where(df['pnl'] > 0, "+$", "$"), index=df.index) + fmt('pnl', '{:.2f}')
+
+    rows = ('<div style="display: flex; align-items: center; border-bottom: 1px solid #1b2b44; padding: 10px 0; word-wrap: break-word;">'
+        '<div style="flex: 3; display: flex; align-items: center; min-width: 100px;">'
+        '<img src="' + df['icon'].astype(str) + '" width="40" height="40" style="border-radius: 4px; object-fit: cover; margin-right: 10px;" />'
+        '<div style="word-wrap: break-word;">'
+        '<div style="font-weight: 700; font-size: 15px; color: #ffffff; word-wrap: break-word;">'
+        "<a href='" + df['market_link'].astype(str) + "' target='_blank' style='color: #ffffff; text-decoration: none; word-wrap: break-word;'>"
+        + df['market'].astype(str).map(html.escape) + '</a></div>'
+        '<div style="margin-top: 5px; font-size: 12px; color: #b0b8c4; display: flex; align-items: center; gap: 8px; word-wrap: break-word;">'
+        '<span style="background: ' + pd.Series(np.where(df['outcome'] == "No", "#f76d6d", "#00c0f2"), index=df.index)
+        + '; color: #000; padding: 2px 8px; border-radius: 6px; font-weight: bold; font-size: 11px; word-wrap: break-word;">'
+        + df['outcome'].astype(str) + '</span>' + fmt('shares', '{:.1f}') + ' shares</div></div></div>'
+        '<div style="flex: 1; display: flex; align-items: center; justify-content: center; gap: 8px; min-width: 100px;">'
+        '<div style="width: 10px; height: 24px; border-radius: 4px; background-color: ' + pd.Series(risk['color'], index=df.index) + ';"></div>'
+        '<span><span title="' + tooltip + '" style="cursor: pointer; text-decoration: underline; color: #00c0f2;" onclick="alert(\'' + tooltip + '\')">'
+        + df['risk_range'].astype(str) + '</span></span></div>'
+        + cell + df['end_date'].astype(str) + '</div>'
+        + cell + fmt('avg', '{:.0f}') + '¢</div>'
+        + cell + fmt('current', '{:.0f}') + '¢</div>'
+        + cell + '$' + fmt('risk', '{:.2f}') + '</div>')
+    for column in ['liquidation_25%', 'liquidation_50%', 'liquidation_75%', 'liquidation pnl']:
+        rows += ('<div style="flex: 1; text-align: center; color: ' + signed_color(column) + '; min-width: 100px;">$'
+            + fmt(column, '{:.2f}') + '</div>')
+    rows += (cell + '$' + fmt('reward', '{:.2f}')
+        + '<div style="font-size: 12px; word-wrap: break-word;">' + fmt('return_pct', '{:.2f}') + '%</div></div>'
+        '<div style="flex: 1; text-align: right; padding-right: 10px; min-width: 100px; word-wrap: break-word;">$' + fmt('value', '{:.2f}')
+        + '<div style="font-size: 12px; color: ' + signed_color('pnl') + '; word-wrap: break-word;">'
+        + pnl_text + ' (' + fmt('pnl_percent', '{:.2f}') + '%)</div></div></div>')
+    return "".join(rows)
 
 # Fetch and process data based on the current wallet address in session state
-holdings_df = fetch_holdings(st.session_state.wallet_addresses) # Pass the list
-dt_open = holdings_df[holdings_df['redeemable'] == False].reset_index(drop=True) if not holdings_df.empty else pd.DataFrame()
+with st.spinner("Fetching Holdings..."):
+    holdings_df, holdings_errors, stale_holdings = fetch_holdings(st.session_state.wallet_addresses) # Pass the list
+for address, error in holdings_errors.items():
+    st.error(f"Error fetching holdings for {address}: {error}")
+for address, (age, error) in stale_holdings.items():
+    if error:
+        st.warning(f"Holdings for {address} are from {age / 60:.0f} minutes ago: refreshing them is failing ({error}).")
+    else:
+        st.info(f"Holdings for {address} are from {age / 60:.0f} minutes ago: refreshing them now.")
+dt_open = open_positions(holdings_df)
 asset_ids = dt_open['asset'].tolist() if not dt_open.empty else []
-order_book_asset = fetch_order_books(asset_ids)
-
-percent_list = [0.25, 0.50, 0.75, 1]
-stock_info_df = add_partial_sell_prices(dt_open.copy(), order_book_asset, percent_list).sort_values(by='title', ascending=True) if not dt_open.empty else pd.DataFrame()
-# Apply the mapping to create the 'risk' and 'probability_range' columns
-stock_info_df[['risk_range', 'probability_range']] = stock_info_df['curPrice'].apply(lambda x: pd.Series(get_risk_info_from_price(x)))
-
-if not stock_info_df.empty:
-    df = pd.DataFrame({"market": stock_info_df['title'],
-        "outcome": stock_info_df['outcome'].str.capitalize(),
-        "shares": stock_info_df['size'].round(1),
-        "avg": (stock_info_df['avgPrice'] * 100).round(2),
-        "reward": stock_info_df['reward'].round(2),
-        "return_pct": stock_info_df['%_return'],
-        "risk": stock_info_df['risk'],
-        "current": (stock_info_df['curPrice'] * 100).round(2),
-        "value": stock_info_df['currentValue'].round(2),
-        "liquidation_25%": stock_info_df['market_pnl_25%'].round(2),
-        "liquidation_50%": stock_info_df['market_pnl_50%'].round(2),
-        "liquidation_75%": stock_info_df['market_pnl_75%'].round(2),
-        "liquidation_100%": stock_info_df['market_pnl_100%'].round(2),
-        "initial_value": stock_info_df['initialValue'].round(2),
-        "pnl": (stock_info_df['currentValue'] - stock_info_df['initialValue']).round(2),
-        "liquidation pnl": stock_info_df['market_pnl_100%'].round(2),
-        "pnl_percent": stock_info_df['percentPnl'].round(2),
-        "icon": stock_info_df['icon'],
-        "market_link": stock_info_df['market_link'],
-        "risk_range": stock_info_df['risk_range'],
-        "end_date": stock_info_df.apply(lambda row: row['endDate'] if row['endDate'] else extract_date_from_title(row['title']), axis=1)})
-    
+with st.spinner("Fetching Order Books..."):
+    order_book_asset, book_errors, stale_books = fetch_order_books(asset_ids)
+if book_errors:
+    st.warning(f"{len(book_errors)} order book(s) unavailable: liquidation values show 0 for those positions.", icon="⚠️")
+failing_books = sum(error is not None for _, error in stale_books.values())
+if failing_books:
+    st.warning(f"{failing_books} order book(s) are over {STALE_AFTER * books.ORDER_BOOK_TTL // 60} minutes old: refreshing them is failing.", icon="⚠️")
+if len(stale_books) > failing_books:
+    st.info(f"{len(stale_books) - failing_books} order book(s) are over {STALE_AFTER * books.ORDER_BOOK_TTL // 60} minutes old: refreshing them now.")
+
+percent_list = liquidation.PERCENT_LIST
+live = None
+if live_mode and not dt_open.empty:
+    live = get_live_portfolio(tuple(dt_open['asset'].astype(str)), tuple(dt_open['size']), tuple(percent_list), allocation,
+        dt_open, order_book_asset)
+    stock_info_df = live.liquidation.snapshot().sort_values(by='title', ascending=True)
+else:
+    get_live_portfolio.clear()
+    stock_info_df = add_partial_sell_prices(dt_open.copy(), order_book_asset, percent_list, allocation).sort_values(by='title', ascending=True) if not dt_open.empty else pd.DataFrame()
+def sort_by_column(col_name):
+    if st.session_state.sort_by == col_name:
+        st.session_state.ascending = not st.session_state.ascending
+    else:
+        st.session_state.sort_by = col_name
+        st.session_state.ascending = True
+
+def header_button(label, col_name):
+    arrow = "↑" if st.session_state.sort_by == col_name and st.session_state.ascending else "↓"
+    st.button(f"{label} {arrow}" if st.session_state.sort_by == col_name else label,
+        key=f"sort_button_{col_name}", on_click=sort_by_column, args=(col_name,))
+
+def render_positions_table(df):
+    # Use st.columns with a list to define the column widths
+    cols = [3, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]  # 12 values
+    col_headers = st.columns(cols)
+
+    # Apply header_button to each column
+    with col_headers[0]: header_button("MARKET", "market")
+    with col_headers[1]: header_button("Risk Level", "risk_range")
+    with col_headers[2]: header_button("Close Date", "end_date")
+    with col_headers[3]: header_button("AVG", "avg")
+    with col_headers[4]: header_button("CURRENT", "current")
+    with col_headers[5]: header_button("RISK", "risk")
+    with col_headers[6]: header_button("Liq 25%", "liquidation_25%")
+    with col_headers[7]: header_button("Liq 50%", "liquidation_50%")
+    with col_headers[8]: header_button("Liq 75%", "liquidation_75%")
+    with col_headers[9]: header_button("Liq 100%", "liquidation pnl")
+    with col_headers[10]: header_button("REWARD", "reward")
+    with col_headers[11]: header_button("VALUE", "value")
+
+    df = df.sort_values(by=st.session_state.sort_by, ascending=st.session_state.ascending)
+
+    # One markdown element per page of rows instead of one per position
+    table = st.container()
+    page_size_col, page_col, _ = st.columns([1, 1, 4])
+    page_size = page_size_col.selectbox("Rows per page", ROWS_PER_PAGE_OPTIONS, index=1, key="table_page_size")
+    page_count = max(1, -(-len(df) // page_size))
+    if st.session_state.get("table_page", 1) > page_count:
+        st.session_state.table_page = page_count
+    page = page_col.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, key="table_page")
+    with table, span("render_table", rows=min(page_size, len(df))):
+        st.markdown(build_table_html(df.iloc[(page - 1) * page_size:page * page_size]), unsafe_allow_html=True)
+
+def render_analytics(df, positions_df):
+    st.subheader("📊 Portfolio Analytics")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("### PnL by Market")
+        pnl_chart = px.bar(df.sort_values('pnl', ascending=False),
+            x='market',
+            y='pnl',
+            color='pnl',
+            color_continuous_scale='RdYlGn',
+            title="PnL (Profit & Loss) by Market",
+            labels={'pnl': 'PnL ($)', 'market': 'Market'},
+            text_auto=".2s")
+        pnl_chart.update_layout(
+            xaxis_title="Market",
+            yaxis_title="PnL ($)",
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'))
+        st.plotly_chart(pnl_chart, use_container_width=True)
+
+    with col2:
+        st.markdown("### Current Value by Market")
+        value_chart = px.bar(
+            df.sort_values('value', ascending=False),
+            x='market',
+            y='value',
+            color='value',
+            color_continuous_scale='Blues',
+            title="Current Value by Market",
+            labels={'value': 'Value ($)', 'market': 'Market'},
+            text_auto=".2s")
+        value_chart.update_layout(
+            xaxis_title="Market",
+            yaxis_title="Current Value ($)",
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'))
+        st.plotly_chart(value_chart, use_container_width=True)
+
+    render_history(df)
+    render_resolution_risk(positions_df)
+
+    st.markdown("### Detailed Market Table")
+    st.dataframe(df[["market", "outcome", "shares", 'end_date', "avg", "current", "risk", "liquidation_25%", "liquidation_50%", "liquidation_75%", "liquidation pnl", "reward", "return_pct", "value", "pnl"]],
+        use_container_width=True,
+        hide_index=True)
+
+HISTORY_RANGES = {"24 hours": pd.Timedelta(days=1), "7 days": pd.Timedelta(days=7),
+    "30 days": pd.Timedelta(days=30), "90 days": pd.Timedelta(days=90)}
+
+def render_history(df):
+    st.markdown("### Portfolio History")
+    window = HISTORY_RANGES[st.selectbox("Range", list(HISTORY_RANGES), index=1, key="history_range")]
+    history = get_history_store().query(start=pd.Timestamp.now(tz="UTC") - window, bucket=bucket_for(window),
+        wallets=df['wallet'].dropna().unique().tolist(), metrics=["value", "pnl", "liquidation_100%"])
+    if history.empty:
+        st.info("No history yet: a snapshot is recorded whenever the dashboard loads data, at most once a minute.")
+        return
+    history_chart = px.line(history, x='ts', y=['value_last', 'liquidation_100%_last', 'pnl_last'],
+        title="Value, Liquidation Value and PnL over time",
+        labels={'ts': 'Time', 'value': 'USD ($)', 'variable': ''})
+    # min/max band around PnL so intra-bucket swings stay visible after downsampling
+    history_chart.add_scatter(x=history['ts'], y=history['pnl_max'], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip')
+    history_chart.add_scatter(x=history['ts'], y=history['pnl_min'], mode='lines', line=dict(width=0), fill='tonexty',
+        fillcolor='rgba(128,128,128,0.2)', name='PnL range')
+    history_chart.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white'))
+    st.plotly_chart(history_chart, use_container_width=True)
+
+@st.cache_data(show_spinner="Simulating resolutions...")
+def simulate_resolutions(positions_df, n_scenarios, correlation):
+    return simulate.simulate_resolutions(positions_df, n_scenarios, correlation, seed=0)
+
+def render_resolution_risk(positions_df):
+    st.markdown("### Resolution Risk (Monte Carlo)")
+    col1, col2 = st.columns(2)
+    n_scenarios = col1.select_slider("Scenarios", [10_000, 50_000, 100_000, 200_000, 500_000], value=200_000, key="sim_scenarios")
+    correlation = col2.slider("Correlation within an event", 0.0, 1.0, 0.0, 0.05, key="sim_correlation",
+        help="0 resolves every market independently; 1 moves all markets of an event together.")
+    columns = [c for c in ['size', 'curPrice', 'initialValue', 'currentValue', 'asset', 'conditionId', 'outcomeIndex', 'eventSlug'] if c in positions_df]
+    result = simulate_resolutions(positions_df[columns], n_scenarios, correlation)
+    if not result:
+        return
+
+    col_a, col_b, col_c, col_d, col_e = st.columns(5)
+    col_a.metric("Expected Payout", f"${result['expected_payout']:,.2f}")
+    col_b.metric("Expected PnL", f"${result['expected_pnl']:,.2f}")
+    col_c.metric("P(Loss)", f"{result['prob_loss']:.1%}")
+    col_d.metric("VaR 95%", f"${result['var_95']:,.2f}")
+    col_e.metric("VaR 99%", f"${result['var_99']:,.2f}")
+
+    counts, edges = np.histogram(result['payouts'], bins=60)
+    payout_chart = px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts / counts.sum(),
+        title="Payout at Resolution", labels={'x': 'Payout ($)', 'y': 'Probability'})
+    payout_chart.update_layout(
+        bargap=0,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='white'))
+    st.plotly_chart(payout_chart, use_container_width=True)
+    st.dataframe(pd.DataFrame({"Percentile": [f"{p}%" for p in result['percentiles']],
+        "Payout ($)": [round(v, 2) for v in result['percentiles'].values()]}), hide_index=True)
+
+@st.cache_data(show_spinner="Building depth curves...", hash_funcs={OrderBook: OrderBook.cache_key})
+def depth_curves(positions_df, order_books_dict, grid, unit):
+    return liquidation.depth_curves(positions_df, order_books_dict, grid, unit)
+
+def render_depth(df, positions_df, order_books_dict):
+    st.subheader("📉 Exit Cost by Size")
+    labels = df['market'] + " · " + df['outcome'] + " · " + df['wallet'].fillna("").str[:8]
+    col1, col2 = st.columns([3, 1])
+    selected = col1.multiselect("Positions", labels.index, default=df['value'].nlargest(5).index.tolist(),
+        format_func=labels.get, key="depth_positions")
+    unit = col2.radio("Size in", ["percent", "usd"], horizontal=True, key="depth_unit",
+        format_func={"percent": "% of position", "usd": "USD proceeds"}.get)
+    if not selected:
+        st.info("Pick one or more positions to see their exit curves.")
+        return
+
+    if unit == "percent":
+        grid, size_label = np.linspace(0.01, 1, 100), "Share of position sold"
+    else:
+        max_usd = st.number_input("Up to ($)", min_value=10.0, value=float(max(df.loc[selected, 'value'].max(), 10.0)), step=100.0, key="depth_max_usd")
+        grid, size_label = np.linspace(max_usd / 100, max_usd, 100), "Proceeds targeted ($)"
+    curves = depth_curves(positions_df.loc[selected, ['asset', 'size', 'curPrice']], order_books_dict, grid, unit)
+    if curves.empty:
+        st.info("No order book for the selected positions.")
+        return
+    curves['position'] = labels.loc[curves.index].to_numpy()
+
+    col_a, col_b = st.columns(2)
+    for col, y, title, label in ((col_a, 'slippage_pct', "Slippage vs Current Price", "Slippage (%)"),
+            (col_b, 'avg_price', "Average Fill Price", "Price ($)")):
+        chart = px.line(curves, x='grid', y=y, color='position', title=title,
+            labels={'grid': size_label, y: label, 'position': ''},
+            hover_data={'shares': ':.1f', 'proceeds': ':.2f', 'last_price': ':.2f'})
+        if unit == "percent":
+            chart.update_xaxes(tickformat=".0%")
+        chart.update_layout(
+            legend=dict(orientation='h', y=-0.3),
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='white'))
+        col.plotly_chart(chart, use_container_width=True)
+
+@st.fragment
+def dashboard_views(df, positions_df, order_books_dict):
+    """
+    The Dashboard/Analytics/Depth views rerun on their own: sorting only reorders
+    the precomputed view model, and the charts are built only while their view is open.
+    """
+    view = st.radio("View", ["📋 Dashboard", "📈 Analytics", "📉 Depth"], horizontal=True, key="active_view", label_visibility="collapsed")
+    if view == "📋 Dashboard":
+        render_positions_table(df)
+    elif view == "📈 Analytics":
+        render_analytics(df, positions_df)
+    else:
+        render_depth(df, positions_df, order_books_dict)
+
+def render_portfolio(stock_info_df, order_books_dict, record_history=True):
+    with span("view_model", rows=len(stock_info_df)):
+        df = build_view_model(stock_info_df)
+    if record_history:
+        get_history_store().append(df)
+
     # Total Metrics
-    total_risk = df['risk'].sum().round(2)
-    total_value = df['value'].sum().round(2)
-    total_pnl = df['pnl'].sum().round(2)
-    market_pnl = df['liquidation_100%'].sum().round(2)
+    totals = portfolio_totals(df)
 
     col_a, col_b, col_c, col_d = st.columns(4)
-    col_a.metric("💸 Total Risk", f"${total_risk:,.2f}")
-    col_b.metric("📈 Total Value", f"${total_value:,.2f}")
-    col_c.metric("📈 Market Value", f"${market_pnl:,.2f}")
-    pnl_color = "🟢" if total_pnl > 0 else "🔴"
-    col_d.metric(f"{pnl_color} Total PnL", f"${total_pnl:,.2f}")
+    col_a.metric("💸 Total Risk", f"${totals['total_risk']:,.2f}")
+    col_b.metric("📈 Total Value", f"${totals['total_value']:,.2f}")
+    col_c.metric("📈 Market Value", f"${totals['market_value']:,.2f}")
+    pnl_color = "🟢" if totals['total_pnl'] > 0 else "🔴"
+    col_d.metric(f"{pnl_color} Total PnL", f"${totals['total_pnl']:,.2f}")
 
-    tabs = st.tabs(["📋 Dashboard", "📈 Analytics"])
+    dashboard_views(df, stock_info_df, order_books_dict)
     with st.expander("📊 View Risk Classification Table"):
         st.table(risk_df)
 
-    
-
-    with tabs[0]:
-        # Use st.columns with a list to define the column widths
-        cols = [3, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]  # 12 values
-        col_headers = st.columns(cols)
-
-        def header_button(label, col_name):
-            arrow = "↑" if st.session_state.sort_by == col_name and st.session_state.ascending else "↓"
-            if st.button(f"{label} {arrow}" if st.session_state.sort_by == col_name else label, key=f"sort_button_{col_name}"):
-                if st.session_state.sort_by == col_name:
-                    st.session_state.ascending = not st.session_state.ascending
-                else:
-                    st.session_state.sort_by = col_name
-                    st.session_state.ascending = True
-
-        # Apply header_button to each column
-        with col_headers[0]: header_button("MARKET", "market")
-        with col_headers[1]: header_button("Risk Level", "risk_range")
-        with col_headers[2]: header_button("Close Date", "end_date")
-        with col_headers[3]: header_button("AVG", "avg")
-        with col_headers[4]: header_button("CURRENT", "current")
-        with col_headers[5]: header_button("RISK", "risk")
-        with col_headers[6]: header_button("Liq 25%", "liquidation_25%")
-        with col_headers[7]: header_button("Liq 50%", "liquidation_50%")
-        with col_headers[8]: header_button("Liq 75%", "liquidation_75%")
-        with col_headers[9]: header_button("Liq 100%", "liquidation pnl")
-        with col_headers[10]: header_button("REWARD", "reward")
-        with col_headers[11]: header_button("VALUE", "value")
-        
-
-        df = df.sort_values(by=st.session_state.sort_by, ascending=st.session_state.ascending)
-    
-        for _, row in df.iterrows():
-            outcome_bg = "#f76d6d" if row['outcome'] == "No" else "#00c0f2"
-            outcome_color = "#000"
-            pnl_color = "#00f27d" if row['pnl'] > 0 else "#f76d6d"
-
-            tooltip = ""
-            for (low, high), label in risk_mapping.items():
-                if low <= row['avg'] <= high:
-                    tooltip = f"{label}: {low}%-{high}%"
-                    break
-
-            # HTML span with tooltip on hover
-            risk_range_html = f"""
-            <span title="{tooltip}" style="cursor: pointer; text-decoration: underline; color: #00c0f2;" onclick="alert('{tooltip}')">
-                {row['risk_range']}
-            </span>
-            """
-    
-            st.markdown(f"""
-            <div style="display: flex; align-items: center; border-bottom: 1px solid #1b2b44; padding: 10px 0; word-wrap: break-word;">
-                <div style="flex: 3; display: flex; align-items: center;  min-width: 100px;">
-                    <img src="{row['icon']}" width="40" height="40" style="border-radius: 4px; object-fit: cover; margin-right: 10px;" />
-                    <div style="word-wrap: break-word;">
-                        <div style="font-weight: 700; font-size: 15px; color: #ffffff; word-wrap: break-word;">
-                            <a href='{row['market_link']}' target='_blank' style='color: #ffffff; text-decoration: none; word-wrap: break-word;'>{row['market']}</a>
-                        </div>
-                        <div style="margin-top: 5px; font-size: 12px; color: #b0b8c4; display: flex; align-items: center; gap: 8px; word-wrap: break-word;">
-                            <span style="background: {outcome_bg}; color: {outcome_color}; padding: 2px 8px; border-radius: 6px; font-weight: bold; font-size: 11px; word-wrap: break-word;">{row['outcome']}</span>
-                            {row['shares']:.1f} shares
-                        </div> 
-                    </div>
-                </div>
-                <div style="flex: 1; display: flex; align-items: center; justify-content: center; gap: 8px; min-width: 100px;">
-    <div style="width: 10px; height: 24px; border-radius: 4px; background-color: {risk_color_scale(row['avg'])};"></div>
-    <span>{risk_range_html}</span>
-</div>
-                <div style="flex: 1; text-align: center; min-width: 100px;">{row['end_date']}</div>
-                <div style="flex: 1; text-align: center; min-width: 100px;">{row['avg']:.0f}¢</div>
-                <div style="flex: 1; text-align: center; min-width: 100px;">{row['current']:.0f}¢</div>
-                <div style="flex: 1; text-align: center; min-width: 100px;">${row['risk']:.2f}</div>
-                <div style="flex: 1; text-align: center; color: {('#00f27d' if row['liquidation_25%'] > 0 else '#f76d6d')}; min-width: 100px;">${row['liquidation_25%']:.2f}</div>
-                <div style="flex: 1; text-align: center; color: {('#00f27d' if row['liquidation_50%'] > 0 else '#f76d6d')}; min-width: 100px;">${row['liquidation_50%']:.2f}</div>
-                <div style="flex: 1; text-align: center; color: {('#00f27d' if row['liquidation_75%'] > 0 else '#f76d6d')}; min-width: 100px;">${row['liquidation_75%']:.2f}</div>
-                <div style="flex: 1; text-align: center; color: {('#00f27d' if row['liquidation pnl'] > 0 else '#f76d6d')}; min-width: 100px;">${row['liquidation pnl']:.2f}</div>
-                <div style="flex: 1; text-align: center; min-width: 100px;">${row['reward']:.2f}<div style="font-size: 12px; word-wrap: break-word;">{row['return_pct']:.2f}%</div></div>
-                <div style="flex: 1; text-align: right; padding-right: 10px; min-width: 100px; word-wrap: break-word;">${row['value']:.2f}<div style="font-size: 12px; color: {pnl_color}; word-wrap: break-word;">{f'+${row["pnl"]:.2f}' if row['pnl'] > 0 else f'${row["pnl"]:.2f}'} ({row['pnl_percent']:.2f}%)</div></div>
-                </div>
-            """, unsafe_allow_html=True)
-
-    with tabs[1]:
-        st.subheader("📊 Portfolio Analytics")
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.markdown("### PnL by Market")
-            pnl_chart = px.bar(df.sort_values('pnl', ascending=False),
-                x='market',
-                y='pnl',
-                color='pnl',
-                color_continuous_scale='RdYlGn',
-                title="PnL (Profit & Loss) by Market",
-                labels={'pnl': 'PnL ($)', 'market': 'Market'},
-                text_auto=".2s")
-            pnl_chart.update_layout(
-                xaxis_title="Market",
-                yaxis_title="PnL ($)",
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='white'))
-            st.plotly_chart(pnl_chart, use_container_width=True)
-
-        with col2:
-            st.markdown("### Current Value by Market")
-            value_chart = px.bar(
-                df.sort_values('value', ascending=False),
-                x='market',
-                y='value',
-                color='value',
-                color_continuous_scale='Blues',
-                title="Current Value by Market",
-                labels={'value': 'Value ($)', 'market': 'Market'},
-                text_auto=".2s")
-            value_chart.update_layout(
-                xaxis_title="Market",
-                yaxis_title="Current Value ($)",
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='white'))
-            st.plotly_chart(value_chart, use_container_width=True)
-
-        st.markdown("### Detailed Market Table")
-        st.dataframe(df[["market", "outcome", "shares", 'end_date', "avg", "current", "risk", "liquidation_25%", "liquidation_50%", "liquidation_75%", "liquidation pnl", "reward", "return_pct", "value", "pnl"]],
-            use_container_width=True,
-            hide_index=True)
+@st.fragment(run_every=LIVE_REFRESH)
+def render_live_portfolio(live, record_history=True):
+    """Redraws from the live books every LIVE_REFRESH seconds without refetching holdings."""
+    if live.stale:
+        st.warning(f"Live order book feed lost {time.time() - live.stale_since:.0f}s ago ({live.error}): reconnecting, "
+            "liquidation values may be out of date.", icon="⚠️")
+    render_portfolio(live.liquidation.snapshot().sort_values(by='title', ascending=True), live.books.snapshot(),
+        record_history and not live.stale)
+
+# Only frames built from current data go into the history: a missing book zeroes its liquidation
+# columns and an old snapshot isn't the value now, so either would chart as a drop that never happened
+data_is_current = not (holdings_errors or stale_holdings or book_errors or stale_books)
+if live is not None:
+    render_live_portfolio(live, data_is_current)
+elif not stock_info_df.empty:
+    render_portfolio(stock_info_df, order_book_asset, data_is_current)
+
+def render_debug_panel():
+    """Stage timings since the server started; shown with ?debug=1 in the URL."""
+    with st.expander("🩺 Debug: stage timings", expanded=True):
+        summary = pd.DataFrame.from_dict(tracer.summary(), orient='index')
+        if not summary.empty:
+            summary[['mean', 'p50', 'p95']] = (summary[['mean', 'p50', 'p95']] * 1000).round(1)
+            st.dataframe(summary.rename(columns={'mean': 'mean (ms)', 'p50': 'p50 (ms)', 'p95': 'p95 (ms)'}), use_container_width=True)
+        recent = list(tracer.recent)[-50:][::-1]
+        st.dataframe(pd.DataFrame({"stage": [s.name for s in recent],
+            "started": pd.to_datetime([s.start for s in recent], unit='s'),
+            "ms": [round(s.duration * 1000, 1) for s in recent],
+            "attributes": [", ".join(f"{k}={v}" for k, v in s.attrs.items()) for s in recent]}),
+            use_container_width=True, hide_index=True)
+        st.download_button("Download Prometheus metrics", tracer.prometheus_text(), file_name="pl_market.prom", mime="text/plain")
+
+start_metrics_server()
+tracer.record(Span("page", {"positions": len(stock_info_df)}), time.perf_counter() - page_started)
+if os.environ.get("PL_MARKET_METRICS_FILE"):
+    tracer.write_prometheus(os.environ["PL_MARKET_METRICS_FILE"])
+if st.query_params.get("debug") == "1":
+    render_debug_panel()
@@ -0,0 +1,38 @@
+import pickle
+
+import numpy as np
+
+from pl_market.books import OrderBook
+
+
+def test_cache_key_splits_sides():
+    # The same four floats flatten either way: two bids, or one bid and one ask
+    two_bids = OrderBook("a", [0.6, 0.5], [0.4, 0.3], [], [])
+    bid_and_ask = OrderBook("a", [0.6], [0.5], [0.4], [0.3])
+    assert two_bids._levels() == bid_and_ask._levels()
+    assert two_bids.cache_key() != bid_and_ask.cache_key()
+
+
+def test_cache_key_tracks_contents():
+    book = OrderBook("a", [0.6], [10], [0.7], [5])
+    assert book.cache_key() == OrderBook("a", [0.6], [10], [0.7], [5]).cache_key()
+    assert book.cache_key() != OrderBook("a", [0.6], [11], [0.7], [5]).cache_key()
+    assert book.cache_key() != OrderBook("b", [0.6], [10], [0.7], [5]).cache_key()
+
+
+def test_pickle_round_trip():
+    book = OrderBook("a", [0.5, 0.6, 0.4], [20, 10, 30], [0.8, 0.7], [1, 2],
+        market="0xmarket", timestamp="1700000000", hash="abc")
+    restored = pickle.loads(pickle.dumps(book))
+    for side in ('bid_price', 'bid_size', 'bid_notional', 'ask_price', 'ask_size', 'ask_notional'):
+        np.testing.assert_array_equal(getattr(restored, side), getattr(book, side))
+    assert (restored.asset_id, restored.market, restored.timestamp, restored.hash) == ("a", "0xmarket", "1700000000", "abc")
+    assert restored.cache_key() == book.cache_key()
+
+
+def test_pickle_round_trip_one_sided():
+    for book in (OrderBook("a", [0.6, 0.5], [10, 20], [], []), OrderBook("a", [], [], [0.7], [5])):
+        restored = pickle.loads(pickle.dumps(book))
+        assert len(restored.bid_price) == len(book.bid_price)
+        assert len(restored.ask_price) == len(book.ask_price)
+        assert restored.cache_key() == book.cache_key()
@@ -0,0 +1,43 @@
+"""End dates parsed from market titles, through both the per-title and the vectorized path."""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from pl_market.dates import extract_date_from_title, extract_end_dates
+
+REFERENCE = date(2025, 6, 1)
+
+CASES = [
+    ("Will ETH hit $2000 by June 30?", "2025-06-30"),  # a price is not a year
+    ("$2050 before Dec 31?", "2024-12-31"),  # nearest Dec 31 to the reference
+    ("Bitcoin above $100,000 by March 1?", "2025-03-01"),
+    ("Will X happen by June 30, 2026?", "2026-06-30"),  # a year right after the day
+    ("Trump out by May 31 2026?", "2026-05-31"),
+    ("Will X happen in 2026 by May 31?", "2025-05-31"),  # a year elsewhere in the title doesn't count
+    ("Will X happen before 2027?", "2027-12-31"),  # year only: Dec 31
+    ("Will ETH reach $2025.5 in 2026?", "2026-12-31"),
+    ("Will it happen by Feb 30?", ""),  # no such day
+    ("Will it happen by Jan 15?", "2025-01-15"),
+    ("Will it happen by Dec 15?", "2024-12-15"),
+    ("Out by Sept. 5?", "2025-09-05"),
+    ("Who wins the match?", ""),
+    ("Price of $2030?", ""),
+]
+
+
+@pytest.mark.parametrize("title, expected", CASES)
+def test_extract_date_from_title(title, expected):
+    assert extract_date_from_title(title, reference=REFERENCE) == expected
+
+def test_extract_end_dates_agrees_with_per_title_parsing():
+    titles = pd.Series([title for title, _ in CASES] * 2 + [None], index=range(100, 100 + 2 * len(CASES) + 1))
+    dates = extract_end_dates(titles, reference=REFERENCE)
+    assert dates.index.equals(titles.index)
+    assert dates.tolist() == [expected for _, expected in CASES] * 2 + [""]
+
+def test_event_year_fills_in_for_titles_without_one():
+    titles = pd.Series(["Will it happen by Jan 15?", "Will X happen by June 30, 2026?", "Who wins?"])
+    dates = extract_end_dates(titles, reference=REFERENCE, context_years=pd.Series([2027, 2027, 2027]))
+    assert dates.tolist() == ["2027-01-15", "2026-06-30", ""]
+    assert extract_date_from_title(titles[0], reference=REFERENCE, context_year=2027) == "2027-01-15"
@@ -0,0 +1,59 @@
+"""HistoryStore snapshots and the portfolio totals query builds from them."""
+import pandas as pd
+import pytest
+
+from pl_market.history import HistoryStore, running_totals
+
+T0 = pd.Timestamp("2026-10-17 00:00:00", tz="UTC")
+
+
+def frame(values):
+    """A build_view_model-like frame from {(wallet, asset): value}."""
+    return pd.DataFrame([{"wallet": wallet, "asset": asset, "market": f"m-{asset}", "value": value, "pnl": value / 10,
+        "liquidation_100%": value / 2} for (wallet, asset), value in values.items()])
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoryStore(str(tmp_path / "history"), interval=30)
+
+def query(store, **kwargs):
+    return store.query(start=T0 - pd.Timedelta(hours=1), bucket="1min", metrics=["value"], **kwargs)
+
+
+def test_wallets_recorded_apart_add_up(store):
+    store.append(frame({("A", "a1"): 1.0}), at=T0)
+    for i in range(1, 5):
+        store.append(frame({("A", "a1"): 1.0, ("B", "b1"): 100.0}), at=T0 + pd.Timedelta(seconds=30 * i))
+        # another session watching only A records it on its own clock
+        store.append(frame({("A", "a1"): 1.0}), at=T0 + pd.Timedelta(seconds=30 * i + 10))
+
+    history = query(store, wallets=["A", "B"])
+    assert history["value_last"].tolist() == [101.0, 101.0, 101.0]
+    assert history["value_max"].tolist() == [101.0, 101.0, 101.0]
+    assert history["value_min"].tolist() == [1.0, 101.0, 101.0]  # B wasn't tracked yet at T0
+
+def test_frame_is_rate_limited_per_wallet_set(store):
+    assert store.append(frame({("A", "a1"): 1.0, ("B", "b1"): 2.0}), at=T0) == 2
+    assert store.append(frame({("A", "a1"): 1.0, ("B", "b1"): 2.0}), at=T0 + pd.Timedelta(seconds=10)) == 0
+    assert store.append(frame({("A", "a1"): 1.0}), at=T0 + pd.Timedelta(seconds=10)) == 1
+
+def test_closed_position_drops_to_zero(store):
+    store.append(frame({("A", "a1"): 5.0, ("A", "a2"): 7.0}), at=T0)
+    store.append(frame({("A", "a1"): 6.0}), at=T0 + pd.Timedelta(minutes=2))
+
+    assert query(store)["value_last"].tolist() == [12.0, 6.0]
+    by_market = query(store, by="market")
+    assert by_market[["market", "value_last"]].values.tolist() == [["m-a1", 5.0], ["m-a2", 7.0], ["m-a1", 6.0], ["m-a2", 0.0]]
+
+def test_by_wallet_keeps_each_wallets_own_snapshots(store):
+    store.append(frame({("A", "a1"): 1.0, ("A", "a2"): 2.0}), at=T0)
+    store.append(frame({("B", "b1"): 100.0}), at=T0 + pd.Timedelta(minutes=1))
+
+    by_wallet = query(store, by="wallet")
+    assert by_wallet[["wallet", "value_last"]].values.tolist() == [["A", 3.0], ["B", 100.0]]
+    assert by_wallet["ts"].tolist() == [T0, T0 + pd.Timedelta(minutes=1)]
+
+def test_running_totals_carry_each_wallet_forward():
+    rows = pd.DataFrame({"ts": [1, 2, 2, 3], "wallet": ["A", "A", "B", "B"], "value": [1.0, 2.0, 10.0, 20.0]})
+    totals = running_totals(rows, ["value"])
+    assert totals.values.tolist() == [[1, 1.0], [2, 12.0], [3, 22.0]]
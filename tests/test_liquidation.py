@@ -0,0 +1,79 @@
+"""The vectorized liquidation engine against the level-by-level walk it replaced."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from pl_market.books import OrderBook
+from pl_market.liquidation import PERCENT_LIST, build_bid_ladders, liquidate_positions, set_liquidation_columns, walk_ladder
+
+
+def reference_sell(position_size, bids, percent):
+    """The original per-row walk: sell into (price, size) bids, best price first, until the target is filled."""
+    remaining = position_size * percent
+    total_sell_value = 0.0
+    final_sell_price = 0.0
+    for price, size in sorted(bids, key=lambda level: -level[0]):
+        if remaining > 0:
+            shares_to_sell = min(remaining, size)
+            total_sell_value += shares_to_sell * price
+            final_sell_price = price
+            remaining -= shares_to_sell
+        if remaining <= 0:
+            break
+    return final_sell_price, total_sell_value
+
+def random_bids(rng):
+    """
+    Up to 30 levels on a 0.01 tick, so some prices repeat; some books have no
+    bids at all. Sizes are whole quarter shares so running totals are exact and
+    a quantity on a level boundary fills that level in both walks.
+    """
+    depth = int(rng.integers(0, 31))
+    prices = rng.integers(1, 100, size=depth) / 100
+    sizes = rng.integers(1, 2000, size=depth) / 4
+    return list(zip(prices.tolist(), sizes.tolist()))
+
+def random_books(seed, n_books=300):
+    rng = np.random.default_rng(seed)
+    raw = {str(i): random_bids(rng) for i in range(n_books)}
+    books = {asset_id: OrderBook(asset_id, [p for p, _ in bids], [s for _, s in bids], [], []) for asset_id, bids in raw.items()}
+    return rng, raw, books
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_walk_ladder_matches_reference(seed):
+    rng, raw, books = random_books(seed)
+    ladders = build_bid_ladders(books)
+    mismatches = 0
+    for asset_id, bids in raw.items():
+        if not bids:
+            continue
+        depth = sum(size for _, size in bids)
+        # inside the book, exactly on level boundaries, and past the whole depth
+        quantities = np.concatenate([rng.uniform(0, depth, size=5), np.cumsum([size for _, size in sorted(bids, key=lambda level: -level[0])])[:3],
+            [depth * 2]])
+        prices, values = walk_ladder(ladders[asset_id], quantities)
+        for quantity, price, value in zip(quantities, prices, values):
+            expected_price, expected_value = reference_sell(quantity, bids, 1.0)
+            mismatches += not (np.isclose(price, expected_price) and np.isclose(value, expected_value, rtol=1e-9, atol=1e-9))
+    assert mismatches == 0
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_liquidation_columns_match_reference(seed):
+    rng, raw, books = random_books(seed)
+    assets = rng.choice(list(raw) + ["no-book"], size=400)
+    positions = pd.DataFrame({'asset': assets, 'size': np.round(rng.uniform(0, 3000, size=len(assets)), 2),
+        'risk': np.round(rng.uniform(0, 1000, size=len(assets)), 2)})
+    positions.loc[::50, 'size'] = 0.0
+
+    sell_prices, sell_values = liquidate_positions(positions['size'], positions['asset'], build_bid_ladders(books), PERCENT_LIST)
+    result = set_liquidation_columns(positions.copy(), books, PERCENT_LIST)
+
+    for i, percent in enumerate(PERCENT_LIST):
+        expected = [reference_sell(size, raw.get(asset, []), percent) for asset, size in zip(positions['asset'], positions['size'])]
+        expected_prices, expected_values = (np.array(column) for column in zip(*expected))
+        np.testing.assert_allclose(sell_prices[:, i], expected_prices)
+        np.testing.assert_allclose(sell_values[:, i], expected_values, rtol=1e-9, atol=1e-9)
+        # positions without a book get 0, not a loss of their whole risk
+        expected_pnl = np.where(positions['asset'].isin(raw), expected_values - positions['risk'] * percent, 0.0)
+        np.testing.assert_allclose(result[f'market_pnl_{int(percent * 100)}%'], expected_pnl, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,149 @@
+"""Live books and liquidation driven by a ReplayFeed, checked against the batch path."""
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_book, make_positions
+from pl_market import live
+from pl_market.books import OrderBook
+from pl_market.holdings import holdings_frame
+from pl_market.liquidation import PERCENT_LIST, set_liquidation_columns
+from pl_market.live import LiveLiquidation, LiveOrderBooks, LivePortfolio, ReplayFeed, follow_feed
+
+LIQUIDATION_COLUMNS = [f"{prefix}{int(percent * 100)}%" for percent in PERCENT_LIST
+    for prefix in ("sell_price_", "total_sell_value_", "market_pnl_")]
+
+
+@pytest.fixture
+def positions():
+    positions = make_positions(n_wallets=2, positions_per_wallet=20, overlap=0.3, seed=1)
+    df = holdings_frame(positions, list(positions))
+    df['asset'] = df['asset'].astype(str)
+    return df
+
+@pytest.fixture
+def raw_books(positions):
+    return {asset_id: make_book(asset_id, depth=8, seed=1) for asset_id in positions['asset'].unique()}
+
+def books_from(raw_books):
+    return {asset_id: OrderBook.from_dict(raw) for asset_id, raw in raw_books.items()}
+
+def replay_messages(raw_books):
+    """A book snapshot for one asset and price_change deltas for two others, plus the raw books they lead to."""
+    first, second, third = list(raw_books)[:3]
+    expected = {asset_id: dict(raw) for asset_id, raw in raw_books.items()}
+    best_bid = max(raw_books[first]['bids'], key=lambda level: float(level['price']))
+    expected[first]['bids'] = [level for level in raw_books[first]['bids'] if level is not best_bid]
+    expected[second]['bids'] = raw_books[second]['bids'] + [{"price": "0.990", "size": "50"}]
+    expected[third] = dict(raw_books[third], bids=[{"price": "0.500", "size": "10"}, {"price": "0.400", "size": "20"}])
+    messages = [
+        {"event_type": "price_change", "timestamp": "1", "price_changes": [
+            {"asset_id": first, "side": "BUY", "price": best_bid['price'], "size": "0"},
+            {"asset_id": second, "side": "BUY", "price": "0.990", "size": "50"}]},
+        {"event_type": "book", "asset_id": third, "market": raw_books[third]['market'], "timestamp": "2",
+            "bids": expected[third]['bids'], "asks": raw_books[third]['asks']},
+    ]
+    return messages, expected
+
+def assert_matches_batch(live_positions, positions, raw_books, allocation=None):
+    expected = set_liquidation_columns(positions.copy(), books_from(raw_books), PERCENT_LIST, allocation)
+    pd.testing.assert_frame_equal(live_positions[LIQUIDATION_COLUMNS].reset_index(drop=True),
+        expected[LIQUIDATION_COLUMNS].reset_index(drop=True))
+
+
+@pytest.mark.parametrize("allocation", [None, "pro_rata", "priority"])
+def test_replay_matches_batch(positions, raw_books, allocation):
+    live_books = LiveOrderBooks(books_from(raw_books))
+    liquidation = LiveLiquidation(positions, live_books.snapshot(), PERCENT_LIST, allocation)
+    messages, expected = replay_messages(raw_books)
+
+    follow_feed(ReplayFeed(messages), live_books, liquidation)
+
+    assert_matches_batch(liquidation.snapshot(), positions, expected, allocation)
+
+def test_replay_from_jsonl(tmp_path, positions, raw_books):
+    messages, expected = replay_messages(raw_books)
+    path = tmp_path / "feed.jsonl"
+    live.record_feed(ReplayFeed(messages), path)
+    live_books = LiveOrderBooks(books_from(raw_books))
+    liquidation = LiveLiquidation(positions, live_books.snapshot(), PERCENT_LIST)
+
+    follow_feed(ReplayFeed(str(path)), live_books, liquidation)
+
+    assert_matches_batch(liquidation.snapshot(), positions, expected)
+
+def test_repeated_price_levels_are_summed(positions, raw_books):
+    asset_id = positions['asset'].iloc[0]
+    raw = raw_books[asset_id]
+    raw_books = dict(raw_books, **{asset_id: dict(raw, bids=raw['bids'] + raw['bids'][-2:])})
+    liquidation = LiveLiquidation(positions, LiveOrderBooks(books_from(raw_books)).snapshot(), PERCENT_LIST)
+    assert_matches_batch(liquidation.snapshot(), positions, raw_books)
+
+
+class FlakyFeed:
+    """Serves the messages once, then drops the connection like a websocket that went away."""
+    def __init__(self, messages):
+        self.messages = messages
+        self.closed = False
+
+    def __iter__(self):
+        yield from self.messages
+        raise ConnectionError("connection reset")
+
+    def close(self):
+        self.closed = True
+
+class BlockingReplay(ReplayFeed):
+    """A ReplayFeed that stays open after its messages, like a quiet websocket."""
+    def __iter__(self):
+        yield from super().__iter__()
+        while not self.closed:
+            time.sleep(0.01)
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_live_portfolio_reconnects_and_flags_stale(monkeypatch, positions, raw_books):
+    monkeypatch.setattr(live, "RECONNECT_BASE", 0.05)
+    messages, expected = replay_messages(raw_books)
+    reconnected = threading.Event()
+    feeds = []
+
+    def feed_factory(asset_ids):
+        assert set(asset_ids) == set(positions['asset'])
+        if not feeds:
+            feeds.append(FlakyFeed(messages[:1]))
+        else:
+            reconnected.wait(5)  # hold the reconnect until the stale flag has been checked
+            feeds.append(BlockingReplay(messages))
+        return feeds[-1]
+
+    portfolio = LivePortfolio(positions, books_from(raw_books), PERCENT_LIST, feed_factory=feed_factory).start()
+    try:
+        wait_for(lambda: portfolio.stale)
+        assert "connection reset" in portfolio.error
+        reconnected.set()
+        wait_for(lambda: portfolio.messages == 3)
+        assert not portfolio.stale
+        assert_matches_batch(portfolio.liquidation.snapshot(), positions, expected)
+    finally:
+        portfolio.close()
+    assert feeds[-1].closed
+
+def test_live_portfolio_skips_malformed_messages(positions, raw_books):
+    messages, expected = replay_messages(raw_books)
+    feed = BlockingReplay([{"event_type": "price_change", "price_changes": [{"asset_id": "x"}]}] + messages)
+    portfolio = LivePortfolio(positions, books_from(raw_books), PERCENT_LIST, feed_factory=lambda asset_ids: feed).start()
+    try:
+        wait_for(lambda: portfolio.messages == 3)
+        assert portfolio.skipped_messages == 1
+        assert not portfolio.stale
+        assert_matches_batch(portfolio.liquidation.snapshot(), positions, expected)
+    finally:
+        portfolio.close()
+    assert feed.closed
@@ -0,0 +1,201 @@
+"""Retries, deadlines, the circuit breaker and hedging in call_upstream, and request coalescing in Refresher."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from pl_market import resilience
+from pl_market.refresh import Refresher
+from pl_market.resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, call_upstream
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status}", response=response)
+
+class Upstream:
+    """fn(timeout) for call_upstream that answers from a script: an exception to raise, or a value to return."""
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def __call__(self, timeout):
+        self.calls += 1
+        answer = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(answer, BaseException):
+            raise answer
+        return answer
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "BACKOFF_BASE", 0.001)
+
+def open_breaker(breaker):
+    for _ in range(breaker.failures):
+        with pytest.raises(requests.HTTPError):
+            call_upstream(Upstream(http_error(503)), breaker=breaker, attempts=1)
+    assert breaker.is_open
+
+
+def test_503_is_retried():
+    upstream = Upstream(http_error(503), http_error(503), "ok")
+    assert call_upstream(upstream, attempts=3) == "ok"
+    assert upstream.calls == 3
+
+def test_404_is_not_retried_and_counts_as_a_breaker_success():
+    breaker = CircuitBreaker("test", failures=2)
+    with pytest.raises(requests.HTTPError):
+        call_upstream(Upstream(http_error(503)), breaker=breaker, attempts=1)
+    upstream = Upstream(http_error(404))
+    with pytest.raises(requests.HTTPError):
+        call_upstream(upstream, breaker=breaker, attempts=3)
+    assert upstream.calls == 1
+    # the 404 reset the run of failures, so one more 503 doesn't open the breaker
+    with pytest.raises(requests.HTTPError):
+        call_upstream(Upstream(http_error(503)), breaker=breaker, attempts=1)
+    assert not breaker.is_open
+
+def test_deadline_caps_total_time():
+    def slow(timeout):
+        time.sleep(min(timeout, 0.2))
+        raise requests.exceptions.Timeout("slow")
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        call_upstream(slow, deadline=Deadline(0.3), timeout=10, attempts=10)
+    assert time.monotonic() - started < 0.5
+
+def test_expired_deadline_sends_nothing():
+    upstream = Upstream("ok")
+    with pytest.raises(DeadlineExceeded):
+        call_upstream(upstream, deadline=Deadline(0))
+    assert upstream.calls == 0
+
+def test_breaker_opens_then_lets_one_probe_through():
+    breaker = CircuitBreaker("test", failures=2, reset=0.05)
+    open_breaker(breaker)
+    upstream = Upstream("ok")
+    with pytest.raises(CircuitOpenError):
+        call_upstream(upstream, breaker=breaker)
+    assert upstream.calls == 0
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the probe
+    assert not breaker.allow()  # everyone else still fails fast
+    breaker.record_success()
+    assert not breaker.is_open and call_upstream(upstream, breaker=breaker) == "ok"
+
+@pytest.mark.parametrize("probe", [
+    lambda breaker: call_upstream(Upstream("ok"), breaker=breaker, deadline=Deadline(0)),  # deadline gone before sending
+    lambda breaker: call_upstream(Upstream(KeyboardInterrupt()), breaker=breaker),  # ended without an answer
+    lambda breaker: call_upstream(Upstream(http_error(400)), breaker=breaker),  # a bad request is still an answer
+])
+def test_probe_that_gets_no_verdict_is_released(probe):
+    breaker = CircuitBreaker("test", failures=2, reset=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+    with pytest.raises((DeadlineExceeded, KeyboardInterrupt, requests.HTTPError)):
+        probe(breaker)
+    # the next call may probe again instead of failing fast forever
+    assert call_upstream(Upstream("ok"), breaker=breaker) == "ok"
+    assert not breaker.is_open
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker("test", failures=2, reset=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+    with pytest.raises(requests.HTTPError):
+        call_upstream(Upstream(http_error(503)), breaker=breaker, attempts=1)
+    with pytest.raises(CircuitOpenError):
+        call_upstream(Upstream("ok"), breaker=breaker)
+
+def test_hedge_returns_the_faster_answer():
+    calls = []
+    lock = threading.Lock()
+
+    def first_attempt_stalls(timeout):
+        with lock:
+            calls.append(timeout)
+            attempt = len(calls)
+        time.sleep(2 if attempt == 1 else 0.01)
+        return attempt
+
+    started = time.monotonic()
+    assert call_upstream(first_attempt_stalls, timeout=5, hedge_after=0.05) == 2
+    assert time.monotonic() - started < 1
+    assert calls[1] < 5  # the hedge only gets what's left of the call's timeout
+
+def test_hedges_are_capped_under_load():
+    calls = []
+    lock = threading.Lock()
+
+    def slow(timeout):
+        with lock:
+            calls.append(timeout)
+        time.sleep(0.3)
+        return "ok"
+
+    n = 4 * resilience.HEDGE_BUDGET
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        results = list(pool.map(lambda _: call_upstream(slow, timeout=5, hedge_after=0.05), range(n)))
+    assert results == ["ok"] * n
+    assert len(calls) <= n + resilience.HEDGE_BUDGET
+    time.sleep(0.35)  # let the leftover hedges finish and hand back their slots
+
+
+def test_refresher_coalesces_concurrent_loads():
+    loads = []
+    release = threading.Event()
+
+    def load(keys):
+        loads.append(list(keys))
+        release.wait(5)
+        return {key: key.upper() for key in keys}, {}
+
+    refresher = Refresher()
+    refresher.register("kind", load, ttl=60)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(refresher.get_many, "kind", ["a", "b"]) for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        results = [future.result() for future in futures]
+    refresher.stop()
+    assert loads == [["a", "b"]]
+    assert all(result == ({"a": "A", "b": "B"}, {}) for result in results)
+
+def test_refresher_get_many_respects_its_timeout():
+    release = threading.Event()
+
+    def load(keys):
+        release.wait(5)
+        return {key: key.upper() for key in keys}, {}
+
+    refresher = Refresher()
+    refresher.register("kind", load, ttl=60)
+    started = time.monotonic()
+    values, errors = refresher.get_many("kind", ["a"], timeout=0.1)
+    assert time.monotonic() - started < 0.5
+    assert values == {} and "still loading" in errors["a"]
+
+    release.set()  # the load lands in memory for the next call
+    time.sleep(0.05)
+    assert refresher.get_many("kind", ["a"], timeout=0.1) == ({"a": "A"}, {})
+    refresher.stop()
+
+def test_refresher_records_failed_refreshes():
+    answers = [({"a": 1}, {}), ({}, {"a": "503 from upstream"}), ({"a": 2}, {})]
+    refresher = Refresher()
+    refresher.register("kind", lambda keys: answers.pop(0), ttl=60)
+    assert refresher.get_many("kind", ["a"]) == ({"a": 1}, {})
+    assert refresher.refresh_errors("kind", ["a"]) == {}
+
+    refresher.refresh("kind", ["a"])["a"].result()
+    assert refresher.get_many("kind", ["a"]) == ({"a": 1}, {})  # the last good value is still served
+    assert refresher.refresh_errors("kind", ["a"]) == {"a": "503 from upstream"}
+
+    refresher.refresh("kind", ["a"])["a"].result()
+    assert refresher.refresh_errors("kind", ["a"]) == {}
+    refresher.stop()
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from pl_market.risk import INVALID_RISK_COLOR, classify_risk_from_prices, get_risk_info_from_price
+
+CASES = [
+    # price, label, range
+    (0.00, "Extreme Risk", "0-19%"),
+    (0.19, "Extreme Risk", "0-19%"),
+    (0.20, "Speculative Risk", "20-30%"),
+    (0.31, "Speculative Risk", "20-30%"),   # gap 31-39 goes to the band below
+    (0.39, "Speculative Risk", "20-30%"),
+    (0.40, "Extremely High Risk", "40-49%"),
+    (0.57, "Very High Risk", "50-60%"),     # 0.57 * 100 is 56.99999...
+    (0.785, "Moderately High Risk", "71-79%"),
+    (0.79, "Moderate Risk", "79-86%"),      # overlap goes to the higher band
+    (0.99, "Very Low Risk", "97-99%"),
+    (1.00, "Very Low Risk", "97-99%"),
+]
+
+
+@pytest.mark.parametrize("price,label,band", CASES)
+def test_band_edges(price, label, band):
+    assert get_risk_info_from_price(price) == (label, band)
+
+
+@pytest.mark.parametrize("price", [np.nan, -0.01, 1.01, 2.0])
+def test_invalid_prices(price):
+    risk = classify_risk_from_prices([price])
+    assert risk['label'][0] == "Invalid Price"
+    assert risk['range'][0] == "N/A"
+    assert risk['tooltip'][0] == ""
+    assert risk['color'][0] == INVALID_RISK_COLOR
+
+
+def test_vectorised_matches_scalar():
+    prices = [price for price, _, _ in CASES] + [np.nan, 1.5]
+    risk = classify_risk_from_prices(prices)
+    assert list(zip(risk['label'], risk['range'])) == [get_risk_info_from_price(p) for p in prices]